@@ -0,0 +1,242 @@
+"""Regression benchmarks for the CPU-bound parts of a Lambda invocation.
+
+Usage:
+    python backend/benchmarks/bench_hot_paths.py --sizes 10 1000 --save baseline.json
+    python backend/benchmarks/bench_hot_paths.py --sizes 10 1000 --compare baseline.json --threshold 10
+
+Each case is run on a seeded corpus, repeated several times and reported as
+the best per-item time, which is the most stable figure across runs. With
+--compare the exit code is 1 when any case is slower than the baseline by
+more than --threshold percent.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import contextlib
+from datetime import date
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Benchmark the built-in extraction rules, never the S3 ones
+os.environ['EXTRACTION_RULES_KEY'] = ''
+sys.path.insert(0, os.path.join(HERE, '..', 'lambda_functions'))
+sys.path.insert(0, HERE)
+
+import lambda_function  # noqa: E402
+import corpus  # noqa: E402
+from botocore.credentials import Credentials  # noqa: E402
+
+# Serialization cases build image URLs with a plain prefix so they measure
+# serialization only, URL signing has its own case with fixed fake credentials
+sign_image_url = lambda_function.presigned_image_url
+lambda_function.presigned_image_url = lambda s3_key: lambda_function.IMAGE_URL_PREFIX + s3_key
+lambda_function._signing_state.update(resolved=True, credentials=Credentials('AKIDBENCH', 'bench-secret', 'bench-token'))
+
+DEFAULT_SIZES = [10, 1000, 100000]
+TODAY = date(2025, 6, 5)
+
+
+def bench_regex_patterns(size):
+    texts = corpus.ocr_texts(size)
+
+    def run():
+        for text in texts:
+            lambda_function.apply_json_regex_patterns(text)
+    return run
+
+
+def bench_regex_patterns_geometry(size):
+    documents = corpus.ocr_lines(size)
+    texts = ['\n'.join(line['text'] for line in lines) for lines in documents]
+
+    def run():
+        for text, lines in zip(texts, documents):
+            lambda_function.apply_json_regex_patterns(text, lines)
+    return run
+
+
+def bench_clean_helpers(size):
+    dates = [f"DLC : {n % 28 + 1:02d}/06/25" for n in range(size)]
+    names = [f"  PRODUIT NUMERO {n}  " for n in range(size)]
+
+    def run():
+        for d, n in zip(dates, names):
+            lambda_function.clean_date(d)
+            lambda_function.clean_product_name(n)
+    return run
+
+
+def bench_expiring_products(size):
+    products = corpus.product_items(size)
+
+    def run():
+        lambda_function.find_expiring_products(products, TODAY)
+    return run
+
+
+def bench_decimal_encoder(size):
+    products = corpus.product_items(size)
+
+    def run():
+        # Same work as plain_product: every product gets its image URL
+        with_urls = [{**product, 'image_url': lambda_function.product_image_url(product)} for product in products]
+        json.dumps({'products': with_urls, 'count': len(with_urls)}, cls=lambda_function.DecimalEncoder)
+    return run
+
+
+def bench_fast_serializer(size):
+    products = corpus.product_items(size)
+
+    def run():
+        plain = [lambda_function.plain_product(product) for product in products]
+        lambda_function.json_dumps({'products': plain, 'count': len(plain)})
+    return run
+
+
+def bench_presigned_urls(size):
+    keys = [f"thumbs/small/{product['file_id']}.jpg" for product in corpus.product_items(size)]
+
+    def run():
+        for key in keys:
+            sign_image_url(key)
+    return run
+
+
+def bench_debug_event_dump(size):
+    events = [corpus.telegram_photo_event(seed) for seed in range(size)]
+
+    def run():
+        for event in events:
+            json.dumps(event, indent=2)
+    return run
+
+
+CASES = {
+    'apply_json_regex_patterns': bench_regex_patterns,
+    'apply_json_regex_patterns geometry': bench_regex_patterns_geometry,
+    'clean_date+clean_product_name': bench_clean_helpers,
+    'find_expiring_products': bench_expiring_products,
+    'DecimalEncoder products': bench_decimal_encoder,
+    'plain_product+json_dumps products': bench_fast_serializer,
+    'presigned_image_url': bench_presigned_urls,
+    'debug event json.dumps': bench_debug_event_dump,
+}
+
+
+def time_case(run, size, repeat, min_time):
+    """Return per-item timings (microseconds) for each repeat"""
+    # Calibrate loops so each sample lasts at least min_time seconds
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed / loops / size * 1e6)
+    return samples
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def run_benchmarks(sizes, cases, repeat, min_time):
+    results = {}
+    for name in cases:
+        for size in sizes:
+            run = CASES[name](size)
+            # Silence the Lambda's print() logging so it doesn't skew timings
+            with contextlib.redirect_stdout(io.StringIO()):
+                samples = time_case(run, size, repeat, min_time)
+            samples.sort()
+            key = f"{name}[{size}]"
+            results[key] = {
+                'case': name,
+                'size': size,
+                'best_us': samples[0],
+                'median_us': samples[len(samples) // 2],
+            }
+            print(f"{key:<45} best {samples[0]:10.3f} us/item   median {samples[len(samples) // 2]:10.3f} us/item")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table, return the list of regressed keys"""
+    regressions = []
+    print(f"\nComparison against {baseline['meta'].get('commit', 'baseline')} (threshold {threshold}%)")
+    for key, current in results.items():
+        previous = baseline['results'].get(key)
+        if not previous:
+            print(f"{key:<45} (new)")
+            continue
+
+        change = (current['best_us'] - previous['best_us']) / previous['best_us'] * 100
+        flag = ''
+        if change > threshold:
+            flag = '  <-- REGRESSION'
+            regressions.append(key)
+        print(f"{key:<45} {previous['best_us']:10.3f} -> {current['best_us']:10.3f} us/item ({change:+6.1f}%){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ShelfSaver hot path benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds per sample')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed slowdown in percent')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.cases, args.repeat, args.min_time)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'json_backend': 'orjson' if lambda_function.orjson else 'json',
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'min_time': args.min_time,
+        },
+        'results': results,
+    }
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold}%")
+            return 1
+        print('\nNo regressions')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
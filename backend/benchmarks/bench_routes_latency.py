@@ -0,0 +1,127 @@
+"""Per-route DynamoDB latency from where the Lambda runs, for two storage layouts.
+
+Runs the table operations each route makes (against real AWS) through the
+same ProductStore the Lambda uses, so reads go to the nearest replica and
+writes to the home region, and reports p50/p95 per route. Run it from the
+Lambda's region (e.g. CloudShell or an EC2 instance in eu-west-3) for
+representative numbers.
+
+Usage:
+    # Before: table in Stockholm
+    python backend/benchmarks/bench_routes_latency.py --home-region eu-north-1 --save before.json
+    # After: Global Tables replica in Paris (or --home-region eu-west-3 after a migration), compare
+    python backend/benchmarks/bench_routes_latency.py --home-region eu-north-1 --replica-regions eu-west-3 --save after.json --compare before.json
+
+Writes only touch a temporary bench-* item that is deleted at the end.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'lambda_functions'))
+
+import lambda_function  # noqa: E402
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+
+def route_operations(store, user_id, product_id):
+    """The table calls behind each API route / handler, as the Lambda makes them"""
+    if user_id and user_id != 'demo':
+        list_products = lambda: store.scan(FilterExpression=Attr('user_id').eq(user_id))
+    else:
+        # get_all_products returns every product for the demo user
+        list_products = lambda: store.scan()
+
+    operations = {
+        'GET /products': list_products,
+        'GET /products/{id}': lambda: store.get(product_id),
+        'PUT /products/{id}': lambda: store.update(
+            Key={'product_id': product_id},
+            UpdateExpression='SET #status = :status',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':status': 'validated'},
+            ReturnValues='ALL_NEW'
+        ),
+        'photo ingest (put_item)': lambda: store.put({
+            'product_id': product_id,
+            'user_id': user_id,
+            'product_name': 'BENCH',
+            'created_at': datetime.now().isoformat(),
+            'status': 'pending'
+        }),
+    }
+    if user_id == 'demo':
+        # The notification check always filters by user, for real users it's the GET /products scan
+        operations['notifier scan'] = lambda: store.scan(FilterExpression=Attr('user_id').eq(user_id))
+    return operations
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-route DynamoDB latency')
+    parser.add_argument('--home-region', required=True, help='region the products table is written in (PRODUCTS_HOME_REGION)')
+    parser.add_argument('--replica-regions', default='', help='comma separated Global Tables replicas (PRODUCTS_REPLICA_REGIONS)')
+    parser.add_argument('--local-region', default=lambda_function.LAMBDA_REGION, help='region the Lambda runs in, picks the read replica')
+    parser.add_argument('--table', default=lambda_function.PRODUCTS_TABLE)
+    parser.add_argument('--user-id', default='demo', help='user whose products are listed ("demo" lists everything, like the dashboard)')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='earlier results to compare against')
+    args = parser.parse_args(argv)
+
+    replicas = [region.strip() for region in args.replica_regions.split(',') if region.strip()]
+    store = lambda_function.ProductStore(args.table, args.home_region, replicas, args.local_region)
+    product_id = f"bench-{uuid.uuid4()}"
+    operations = route_operations(store, args.user_id, product_id)
+
+    results = {}
+    try:
+        # The bench item has to exist before reads/updates
+        operations['photo ingest (put_item)']()
+
+        for route, operation in operations.items():
+            for _ in range(args.warmup):
+                operation()
+
+            samples = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                operation()
+                samples.append((time.perf_counter() - start) * 1000)
+
+            results[route] = {'p50_ms': percentile(samples, 50), 'p95_ms': percentile(samples, 95)}
+            print(f"{route:<28} p50 {results[route]['p50_ms']:7.1f} ms   p95 {results[route]['p95_ms']:7.1f} ms")
+    finally:
+        store.write_table.delete_item(Key={'product_id': product_id})
+
+    layout = f"writes {store.home_region}, reads {store.read_region}"
+    report = {'meta': {'layout': layout, 'table': args.table, 'user_id': args.user_id, 'iterations': args.iterations}, 'results': results}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\n{baseline['meta']['layout']} -> {layout}")
+        for route, current in results.items():
+            previous = baseline['results'].get(route)
+            if previous:
+                print(f"{route:<28} p50 {previous['p50_ms']:7.1f} -> {current['p50_ms']:7.1f} ms   p95 {previous['p95_ms']:7.1f} -> {current['p95_ms']:7.1f} ms")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
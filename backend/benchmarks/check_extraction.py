@@ -0,0 +1,124 @@
+"""Correctness checks for expiry extraction on hand-written OCR labels.
+
+Runs apply_json_regex_patterns (built-in rules) on labels that broke the
+extraction before, plus rule set validation, and prints one line per check.
+
+Usage:
+    python backend/benchmarks/check_extraction.py
+
+Exit code is 1 if any check fails.
+"""
+import os
+import sys
+import json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Check the built-in extraction rules, never the S3 ones
+os.environ['EXTRACTION_RULES_KEY'] = ''
+sys.path.insert(0, os.path.join(HERE, '..', 'lambda_functions'))
+
+import lambda_function  # noqa: E402
+
+
+def label(*rows):
+    """OCR lines stacked top to bottom, rows are (text, confidence)"""
+    return [
+        {
+            'text': text,
+            'confidence': confidence,
+            'bbox': {'left': 0.1, 'top': 0.1 + n * 0.08, 'width': 0.6, 'height': 0.05}
+        }
+        for n, (text, confidence) in enumerate(rows)
+    ]
+
+
+def extract(lines):
+    text = lambda_function.lines_to_text(lines)
+    return lambda_function.apply_json_regex_patterns(text, lines)
+
+
+def check_production_date_next_to_keyword():
+    result = extract(label(
+        ('YAOURT NATURE', 98),
+        ('Fabrique le 01/06/25', 99),
+        ('DLC : 20/06/25', 92),
+    ))
+    assert result['expiry_date'] == '20/06/25', result['expiry_date']
+    assert result['evidence']['expiry_date'] == 0.92, result['evidence']
+
+
+def check_date_under_keyword():
+    result = extract(label(
+        ('LAIT DEMI ECREME', 97),
+        ('A consommer de preference avant', 95),
+        ('12/07/25', 90),
+        ('Lot 01/06/25', 99),
+    ))
+    assert result['expiry_date'] == '12/07/25', result['expiry_date']
+    assert result['evidence']['expiry_date'] < 0.9, result['evidence']
+
+
+def check_keyword_word_boundaries():
+    keywords = lambda_function.BUILTIN_RULES['expiry_keywords']
+    for text in ('EXPORT QUALITY', 'EXPRESS DELIVERY', 'DLCX'):
+        assert not keywords.search(text), text
+    for text in ('EXP 12/07/25', 'EXP. 12/07/25', 'EXP:12/07/25', 'Best before 12/07/25'):
+        assert keywords.search(text), text
+
+
+def check_no_keyword_falls_back_to_text():
+    result = extract(label(
+        ('EXPORT QUALITY', 95),
+        ('SAUMON FUME', 96),
+        ('15/08/25', 88),
+    ))
+    assert result['expiry_date'] == '15/08/25', result['expiry_date']
+    # Weaker evidence than a date next to a keyword
+    assert result['evidence']['expiry_date'] == 0.44, result['evidence']
+
+
+def check_rule_validation():
+    config = json.loads(json.dumps(lambda_function.REGEX_CONFIG))
+    lambda_function.compile_rules(config, 'check')
+
+    broken = [
+        ('confidence_weights', 'expiry_date', True),
+        ('confidence_weights', 'expiry_date', 40.5),
+        ('parsing', 'expiry_keywords', '(DLC'),
+        ('parsing', 'expiry_region_min_score', 2),
+        ('parsing', 'product_name_region_lines', 0),
+    ]
+    for section, key, value in broken:
+        bad = json.loads(json.dumps(config))
+        bad[section][key] = value
+        try:
+            lambda_function.compile_rules(bad, 'check')
+        except ValueError:
+            continue
+        raise AssertionError(f"{section}.{key}={value!r} was accepted")
+
+
+CHECKS = [
+    check_production_date_next_to_keyword,
+    check_date_under_keyword,
+    check_keyword_word_boundaries,
+    check_no_keyword_falls_back_to_text,
+    check_rule_validation,
+]
+
+
+def main():
+    failures = 0
+    for check in CHECKS:
+        try:
+            check()
+            print(f"✅ {check.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"💥 {check.__name__}: {e}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
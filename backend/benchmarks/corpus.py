@@ -0,0 +1,145 @@
+"""Deterministic corpus generators for the ShelfSaver benchmarks.
+
+Everything is seeded so that two runs (or two commits) see exactly the
+same OCR texts, product items and events.
+"""
+import json
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+
+SEED = 2025
+
+PRODUCT_NAMES = [
+    'YAOURT NATURE BIO', 'JAMBON DE PARIS', 'COMTE AOP 18 MOIS',
+    'CREME FRAICHE EPAISSE', 'POULET ROTI FERMIER', 'SALADE CESAR',
+    'Lait demi ecreme', 'Beurre doux', 'Saumon fume', 'Quiche lorraine',
+]
+
+NOISE_LINES = [
+    'A conserver entre 0 et 4 C', 'Ingredients : lait, ferments lactiques',
+    'Poids net', 'Valeurs nutritionnelles pour 100g', 'Fabrique en France',
+    'EMB 75056', 'Prix au kg', 'A consommer de preference avant',
+]
+
+
+def _random_date(rng, base):
+    day = base + timedelta(days=rng.randint(-10, 20))
+    if rng.random() < 0.5:
+        return day.strftime('%d/%m/%y')
+    return day.strftime('%d/%m/%Y')
+
+
+def ocr_texts(count, seed=SEED):
+    """Generate Textract-like LINE texts joined with newlines"""
+    rng = random.Random(seed)
+    base = date(2025, 6, 1)
+    texts = []
+
+    for _ in range(count):
+        lines = [rng.choice(PRODUCT_NAMES)]
+        lines.extend(rng.sample(NOISE_LINES, rng.randint(1, 4)))
+
+        style = rng.random()
+        if style < 0.4:
+            lines.append(f"DLC : {_random_date(rng, base)}")
+        elif style < 0.8:
+            lines.append(_random_date(rng, base))
+
+        if rng.random() < 0.5:
+            lines.append(f"x{rng.randint(1, 9)}")
+        if rng.random() < 0.6:
+            lines.append(str(rng.randint(10000000, 99999999)))
+        if rng.random() < 0.2:
+            lines.append(f"(01){rng.randint(10**13, 10**14 - 1)}(17)250601(10){rng.randint(1000, 9999)}")
+
+        tail = lines[1:]
+        rng.shuffle(tail)
+        texts.append('\n'.join(lines[:1] + tail))
+
+    return texts
+
+
+def ocr_lines(count, seed=SEED):
+    """Same texts as ocr_texts, as OCR lines with confidence and stacked bounding boxes"""
+    rng = random.Random(seed)
+    documents = []
+
+    for text in ocr_texts(count, seed):
+        rows = text.split('\n')
+        height = 1.0 / (len(rows) + 1)
+        documents.append([
+            {
+                'text': row,
+                'confidence': rng.uniform(60, 99.9),
+                'bbox': {
+                    'left': 0.1,
+                    'top': n * height,
+                    'width': 0.8,
+                    # Product name first, in the largest print
+                    'height': height * (0.9 if n == 0 else 0.5)
+                }
+            }
+            for n, row in enumerate(rows)
+        ])
+
+    return documents
+
+
+def product_items(count, seed=SEED):
+    """Generate DynamoDB-shaped product items (numbers as Decimal)"""
+    rng = random.Random(seed)
+    base = date(2025, 6, 1)
+    items = []
+
+    for i in range(count):
+        file_id = f"AgACAgQAAxkBAAI{i:08d}"
+        expiry = _random_date(rng, base) if rng.random() < 0.9 else rng.choice(['', 'Unknown', '31/02/25'])
+        items.append({
+            'product_id': f"{rng.getrandbits(128):032x}",
+            'file_id': file_id,
+            'product_name': rng.choice(PRODUCT_NAMES),
+            'expiry_date': expiry,
+            'barcode': str(rng.randint(10000000, 99999999)),
+            'quantity': str(rng.randint(1, 9)),
+            'confidence': Decimal(rng.choice([40, 70, 90, 100])),
+            'raw_text': '\n'.join(rng.sample(NOISE_LINES, 3)),
+            'image_s3_key': f"images/{file_id}.jpg",
+            'user_id': str(rng.randint(100000000, 999999999)),
+            'created_at': f"2025-06-{rng.randint(1, 28):02d}T10:00:00",
+            'status': rng.choice(['pending', 'validated']),
+        })
+
+    return items
+
+
+def telegram_photo_event(seed=SEED):
+    """Generate an API Gateway v2 event wrapping a Telegram photo update"""
+    rng = random.Random(seed)
+    chat_id = rng.randint(100000000, 999999999)
+    body = {
+        'update_id': rng.randint(10**8, 10**9),
+        'message': {
+            'message_id': rng.randint(1, 10**5),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Shop'},
+            'from': {'id': chat_id, 'is_bot': False, 'language_code': 'fr'},
+            'date': 1750000000,
+            'photo': [
+                {'file_id': f"AgACAgQAAxkBAAI{n}", 'file_unique_id': f"AQAD{n}",
+                 'file_size': 1000 * n, 'width': 90 * n, 'height': 120 * n}
+                for n in range(1, 5)
+            ],
+        },
+    }
+    return {
+        'version': '2.0',
+        'routeKey': 'POST /webhook',
+        'rawPath': '/prod/webhook',
+        'headers': {f"x-header-{n}": 'value' for n in range(15)},
+        'requestContext': {
+            'http': {'method': 'POST', 'path': '/prod/webhook', 'sourceIp': '149.154.167.220'},
+            'requestId': f"{rng.getrandbits(64):016x}",
+        },
+        'body': json.dumps(body),
+        'isBase64Encoded': False,
+    }
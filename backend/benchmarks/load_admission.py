@@ -0,0 +1,225 @@
+"""Local load harness for photo admission control.
+
+Simulates concurrent webhook invocations (one thread per Telegram update)
+against the real admission logic in lambda_function, with an in-memory
+store in place of DynamoDB and a fake OCR step that just sleeps. A backlog
+of jobs parked by a Textract outage sits in front of the flood until
+every webhook has run.
+
+Usage:
+    python backend/benchmarks/load_admission.py
+    python backend/benchmarks/load_admission.py --flood 60 --chats 8 --max-inflight 3
+
+Exit code is 1 if a limit was violated, a photo was lost or parked jobs
+blocked new photos.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'lambda_functions'))
+
+import lambda_function  # noqa: E402
+
+
+class MemoryAdmissionStore:
+    """Same interface as DynamoAdmissionStore, backed by dicts and a lock"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.leases = {}
+        self.queues = defaultdict(dict)
+
+    def take_token(self, chat_id, now):
+        with self.lock:
+            tokens, updated_at = self.buckets.get(chat_id, (lambda_function.CHAT_BUCKET_CAPACITY, now))
+            tokens = lambda_function.refill_tokens(tokens, updated_at, now)
+            if tokens < 1:
+                return False
+            self.buckets[chat_id] = (tokens - 1, now)
+            return True
+
+    def acquire_slot(self, job_id, now):
+        with self.lock:
+            self.leases = {k: v for k, v in self.leases.items() if v > now}
+            if len(self.leases) >= lambda_function.MAX_INFLIGHT_OCR:
+                return False
+            self.leases[job_id] = now + lambda_function.OCR_SLOT_LEASE_SECONDS
+            return True
+
+    def release_slot(self, job_id):
+        with self.lock:
+            self.leases.pop(job_id, None)
+
+    def enqueue(self, job):
+        with self.lock:
+            self.queues[lambda_function.job_partition(job)][job['queue_key']] = dict(job)
+
+    def queue_position(self, job):
+        with self.lock:
+            return sum(1 for key in self.queues[lambda_function.job_partition(job)] if key <= job['queue_key'])
+
+    def peek_queue(self, limit, partition=lambda_function.QUEUE_PARTITION):
+        with self.lock:
+            queue = self.queues[partition]
+            return [dict(queue[key]) for key in sorted(queue)[:limit]]
+
+    def claim(self, job):
+        with self.lock:
+            return self.queues[lambda_function.job_partition(job)].pop(job['queue_key'], None) is not None
+
+
+class Recorder:
+    """Fake OCR + Telegram replies, tracking concurrency and latencies"""
+
+    def __init__(self, ocr_seconds):
+        self.ocr_seconds = ocr_seconds
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.max_inflight = 0
+        self.sent_at = {}
+        self.done = defaultdict(list)
+        self.queued_replies = defaultdict(int)
+
+    def process_product_paris(self, bot_token, file_id, chat_id, *args, **kwargs):
+        with self.lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        time.sleep(self.ocr_seconds)
+        with self.lock:
+            self.inflight -= 1
+            self.done[str(chat_id)].append(time.time() - self.sent_at[file_id])
+        return {'file_id': file_id, 'product_name': 'TEST', 'expiry_date': None, 'confidence': 0}
+
+    def send_message(self, bot_token, chat_id, text):
+        if text.startswith('⏳'):
+            with self.lock:
+                self.queued_replies[str(chat_id)] += 1
+
+    def send_structured_product_result(self, bot_token, chat_id, result):
+        pass
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Admission control load harness')
+    parser.add_argument('--flood', type=int, default=40, help='photos sent at once by the flooding chat')
+    parser.add_argument('--chats', type=int, default=5, help='number of well-behaved chats')
+    parser.add_argument('--photos-per-chat', type=int, default=3)
+    parser.add_argument('--max-inflight', type=int, default=4)
+    parser.add_argument('--capacity', type=float, default=3)
+    parser.add_argument('--refill', type=float, default=2.0, help='tokens per second')
+    parser.add_argument('--ocr-seconds', type=float, default=0.2)
+    parser.add_argument('--parked', type=int, default=60, help='jobs parked by a Textract outage that lasts the whole flood')
+    parser.add_argument('--drain-interval', type=float, default=0.5, help='simulated EventBridge schedule')
+    parser.add_argument('--seed', type=int, default=2025)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    store = MemoryAdmissionStore()
+    recorder = Recorder(args.ocr_seconds)
+
+    lambda_function.admission_store = store
+    lambda_function.MAX_INFLIGHT_OCR = args.max_inflight
+    lambda_function.CHAT_BUCKET_CAPACITY = args.capacity
+    lambda_function.CHAT_REFILL_PER_SECOND = args.refill
+    lambda_function.process_product_paris = recorder.process_product_paris
+    lambda_function.send_message = recorder.send_message
+    lambda_function.send_structured_product_result = recorder.send_structured_product_result
+    outage = threading.Event()
+    outage.set()
+    lambda_function.textract_available = lambda: not outage.is_set()
+    # Stand-in for the async self-invoke: drain on another thread
+    lambda_function.request_queue_drain = lambda: threading.Thread(
+        target=lambda_function.drain_ocr_queue, args=('token',)
+    ).start()
+
+    # (delay, chat_id, file_id) for every simulated Telegram update
+    updates = [(0.0, 'flood', f"flood-{n}") for n in range(args.flood)]
+    for chat in range(args.chats):
+        for n in range(args.photos_per_chat):
+            updates.append((rng.uniform(0, 2.0), f"chat-{chat}", f"chat-{chat}-{n}"))
+    total = len(updates) + args.parked
+
+    # Outage backlog, older than every new photo
+    for n in range(args.parked):
+        job = lambda_function.new_ocr_job(f"parked-{n % 3}", f"parked-{n}")
+        job.update({'parked': True, 'attempts': 1, 'image_s3_key': f"images/parked-{n}.jpg"})
+        recorder.sent_at[job['file_id']] = time.time()
+        store.enqueue(job)
+
+    def webhook(delay, chat_id, file_id):
+        time.sleep(delay)
+        recorder.sent_at[file_id] = time.time()
+        lambda_function.handle_photo('token', chat_id, file_id)
+
+    stop = threading.Event()
+
+    def scheduler():
+        while not stop.is_set():
+            lambda_function.drain_ocr_queue('token', max_jobs=args.max_inflight)
+            stop.wait(args.drain_interval)
+
+    started = time.time()
+    threads = [threading.Thread(target=webhook, args=update) for update in updates]
+    drainers = [threading.Thread(target=scheduler) for _ in range(2)]
+    for thread in threads + drainers:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Textract recovers once the flood has been admitted or queued
+    new_photos_done = sum(len(v) for chat, v in recorder.done.items() if not chat.startswith('parked'))
+    outage.clear()
+
+    # Let the scheduled drain finish the backlog
+    deadline = time.time() + 60
+    while sum(len(v) for v in recorder.done.values()) < total and time.time() < deadline:
+        time.sleep(0.1)
+    stop.set()
+    for thread in drainers:
+        thread.join()
+    elapsed = time.time() - started
+
+    processed = sum(len(v) for v in recorder.done.values())
+    flood_latency = recorder.done.get('flood', [])
+    other_latency = [t for chat, values in recorder.done.items() if chat.startswith('chat-') for t in values]
+    parked_done = sum(len(v) for chat, v in recorder.done.items() if chat.startswith('parked'))
+
+    print(f"Photos sent:        {total} ({args.flood} from the flooding chat, {args.parked} parked by an outage)")
+    print(f"Photos processed:   {processed} in {elapsed:.1f}s")
+    print(f"Max OCR in flight:  {recorder.max_inflight} (cap {args.max_inflight})")
+    print(f"Queued replies:     flood {recorder.queued_replies['flood']}, others {sum(v for k, v in recorder.queued_replies.items() if k != 'flood')}")
+    print(f"Flood latency:      p50 {percentile(flood_latency, 50):.2f}s  p95 {percentile(flood_latency, 95):.2f}s")
+    print(f"During the outage:  {new_photos_done} new photo(s) processed past {args.parked} parked, {parked_done} parked done after recovery")
+    print(f"Other chats:        p50 {percentile(other_latency, 50):.2f}s  p95 {percentile(other_latency, 95):.2f}s")
+
+    failures = []
+    if recorder.max_inflight > args.max_inflight:
+        failures.append('global in-flight cap exceeded')
+    if processed != total:
+        failures.append(f"{total - processed} photo(s) never processed")
+    if args.parked and not new_photos_done:
+        failures.append('parked jobs blocked new photos during the outage')
+    if other_latency and flood_latency and percentile(other_latency, 95) > percentile(flood_latency, 95):
+        failures.append('well-behaved chats waited longer than the flooding chat')
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
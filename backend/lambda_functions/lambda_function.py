@@ -1,24 +1,177 @@
 import os
 import re
+import io
 import json
+import hmac
+import time
 import uuid
 import boto3
+import random
+import hashlib
 import urllib.parse
 import urllib.request
+from botocore.config import Config
+from botocore.exceptions import (
+    ClientError, ConnectTimeoutError, ReadTimeoutError, EndpointConnectionError, ConnectionClosedError
+)
 from decimal import Decimal
 from datetime import datetime, timedelta, date
 
 # Initialize AWS clients for PARIS REGION
-textract = boto3.client('textract', region_name='eu-west-3')
-s3 = boto3.client('s3', region_name='eu-west-3')
+# Textract: bounded timeouts, retries are done by call_textract (jitter + circuit breaker)
+textract = boto3.client(
+    'textract',
+    region_name='eu-west-3',
+    config=Config(connect_timeout=2, read_timeout=8, retries={'total_max_attempts': 1})
+)
+# Regional endpoint + SigV4 so pre-signed image URLs don't get redirected
+s3 = boto3.client(
+    's3',
+    region_name='eu-west-3',
+    endpoint_url='https://s3.eu-west-3.amazonaws.com',
+    config=Config(signature_version='s3v4', s3={'addressing_style': 'virtual'})
+)
 
 #DB
-dynamodb = boto3.resource('dynamodb', region_name='eu-north-1')
-table = dynamodb.Table('shelf-saver-products')
+# Products live in PRODUCTS_HOME_REGION (writes). With DynamoDB Global Tables, list the
+# replica regions nearest first in PRODUCTS_REPLICA_REGIONS and reads use the closest one.
+LAMBDA_REGION = os.environ.get('AWS_REGION', 'eu-west-3')
+PRODUCTS_TABLE = os.environ.get('PRODUCTS_TABLE', 'shelf-saver-products')
+PRODUCTS_HOME_REGION = os.environ.get('PRODUCTS_HOME_REGION', 'eu-north-1')
+PRODUCTS_REPLICA_REGIONS = [r.strip() for r in os.environ.get('PRODUCTS_REPLICA_REGIONS', '').split(',') if r.strip()]
+
+def nearest_region(local_region, home_region, replica_regions):
+    """The Lambda's own region if it holds a copy, else the first listed replica, else home"""
+    if local_region == home_region or local_region in replica_regions:
+        return local_region
+    return replica_regions[0] if replica_regions else home_region
+
+class ProductStore:
+    """Product table access: reads from the nearest replica, writes to the home region
+
+    Replica reads are eventually consistent (Global Tables replicate in ~1s),
+    pass consistent=True for a strongly consistent read from the home region.
+    """
+    
+    def __init__(self, table_name, home_region, replica_regions=(), local_region=None):
+        self.home_region = home_region
+        self.read_region = nearest_region(local_region or home_region, home_region, list(replica_regions))
+        
+        self.write_table = boto3.resource('dynamodb', region_name=home_region).Table(table_name)
+        if self.read_region == home_region:
+            self.read_table = self.write_table
+        else:
+            self.read_table = boto3.resource('dynamodb', region_name=self.read_region).Table(table_name)
+        
+        print(f"🗃️ Products: {table_name} (writes {home_region}, reads {self.read_region})")
+    
+    def get(self, product_id, consistent=False):
+        source = self.write_table if consistent else self.read_table
+        return source.get_item(Key={'product_id': product_id}, ConsistentRead=consistent).get('Item')
+    
+    def scan(self, consistent=False, **kwargs):
+        source = self.write_table if consistent else self.read_table
+        return source.scan(ConsistentRead=consistent, **kwargs)
+    
+    def put(self, item):
+        self.write_table.put_item(Item=item)
+    
+    def update(self, **kwargs):
+        return self.write_table.update_item(**kwargs)
+
+products_store = ProductStore(PRODUCTS_TABLE, PRODUCTS_HOME_REGION, PRODUCTS_REPLICA_REGIONS, LAMBDA_REGION)
 
 # Updated bucket name for Paris
 BUCKET_NAME = 'shelfsaver-images-paris'
 
+# Textract resilience
+TEXTRACT_MAX_ATTEMPTS = int(os.environ.get('TEXTRACT_MAX_ATTEMPTS', '4'))
+TEXTRACT_RETRY_BASE_SECONDS = 0.5
+TEXTRACT_RETRY_MAX_SECONDS = 4
+# All Textract attempts, timeouts included, fit in this budget (then the job is parked).
+# The webhook shares API Gateway's 29s with the Telegram download, thumbnails, local OCR
+# and the reply, so keep it well under half of that.
+TEXTRACT_RETRY_BUDGET_SECONDS = 12
+TEXTRACT_BREAKER_THRESHOLD = 3            # consecutive failed calls before the breaker opens
+TEXTRACT_BREAKER_COOLDOWN_SECONDS = 60    # how long it stays open before a trial call
+PARK_MAX_ATTEMPTS = 10                    # parked jobs give up after this many tries
+TEXTRACT_RETRYABLE_ERRORS = {
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'LimitExceededException',
+    'InternalServerError',
+    'ServiceUnavailableException'
+}
+_textract_breaker = {'state': 'closed', 'failures': 0, 'opened_at': 0.0}
+
+# Admission control for photo ingestion, shared state lives next to the Lambda in Paris
+# Table keys: pk (String) + sk (String), TTL attribute: expires_at
+admission_dynamodb = boto3.resource('dynamodb', region_name='eu-west-3')
+admission_table = admission_dynamodb.Table(os.environ.get('ADMISSION_TABLE', 'shelf-saver-admission'))
+
+CHAT_BUCKET_CAPACITY = float(os.environ.get('CHAT_BUCKET_CAPACITY', '5'))      # burst of photos per chat
+CHAT_REFILL_PER_SECOND = float(os.environ.get('CHAT_REFILL_PER_SECOND', '0.2')) # sustained: 1 photo / 5s
+MAX_INFLIGHT_OCR = int(os.environ.get('MAX_INFLIGHT_OCR', '10'))               # global cap (Textract TPS)
+OCR_SLOT_LEASE_SECONDS = 120   # slots of crashed invocations free themselves after this
+DRAIN_BATCH_SIZE = 5           # queued jobs processed per invocation
+DRAIN_PEEK_SIZE = 50           # queued jobs looked at to find a chat that isn't rate limited
+DRAIN_MIN_REMAINING_MS = 20000 # keep enough time to finish the job we start
+DRAIN_EVENT_SOURCE = 'shelfsaver.drain'
+QUEUE_PARTITION = 'queue'      # photos waiting for a token/slot
+PARKED_PARTITION = 'parked'    # photos waiting for Textract to recover, kept apart so they never hide new ones
+
+# Queue drains run in their own async invocation, never inside the webhook request
+# (API Gateway cuts POST /webhook at 30s and Telegram would redeliver the photo)
+lambda_client = boto3.client('lambda', region_name='eu-west-3')
+
+# Public URL prefix for stored images (fallback when pre-signing isn't possible)
+IMAGE_URL_PREFIX = f"https://{BUCKET_NAME}.s3.eu-west-3.amazonaws.com/"
+
+# Thumbnail sizes (longest edge in px), stored under thumbs/{size}/{file_id}.jpg
+THUMBNAIL_SIZES = {
+    'small': 160,
+    'medium': 480,
+    'large': 1024
+}
+
+# Images never change once stored (keys are Telegram file_ids), so cache them for a year
+IMAGE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+# Pre-signed image URLs are signed at the start of a fixed window, so every container
+# hands out the same URL for a key during the window and browsers can cache it
+IMAGE_URL_EXPIRY_SECONDS = int(os.environ.get('IMAGE_URL_EXPIRY_SECONDS', '21600'))
+IMAGE_URL_SIGNING_WINDOW_SECONDS = IMAGE_URL_EXPIRY_SECONDS // 2   # URLs stay valid >= expiry - window
+IMAGE_URL_HOST = f"{BUCKET_NAME}.s3.eu-west-3.amazonaws.com"
+LAZY_THUMBNAILS_PER_REQUEST = int(os.environ.get('LAZY_THUMBNAILS_PER_REQUEST', '10'))
+_signing_state = {'credentials': None, 'resolved': False, 'window_id': None, 'key': None, 'query': None}
+
+# Pillow is only needed for thumbnails and local OCR, ship it as a Lambda layer
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Local OCR engine: pytesseract + the tesseract binary (Lambda layer), optional
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# OCR routing: 'local_first' tries tesseract and escalates to Textract below the
+# confidence threshold, 'textract' always uses Textract
+OCR_ROUTING = os.environ.get('OCR_ROUTING', 'local_first')
+# Evidence-based confidence: a clear name + expiry date with ~90% OCR confidence scores ~60
+OCR_ESCALATION_CONFIDENCE = int(os.environ.get('OCR_ESCALATION_CONFIDENCE', '60'))
+# While Textract is down, local results below this are parked for a Textract retry instead of saved
+OCR_OUTAGE_MIN_CONFIDENCE = int(os.environ.get('OCR_OUTAGE_MIN_CONFIDENCE', str(OCR_ESCALATION_CONFIDENCE)))
+LOCAL_OCR_LANGUAGES = os.environ.get('LOCAL_OCR_LANGUAGES', 'fra+eng')
+
+# orjson is much faster than the stdlib encoder, use it when it's in the deployment package
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Helper to convert DynamoDB Decimal to regular numbers
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
@@ -26,8 +179,39 @@ class DecimalEncoder(json.JSONEncoder):
             return float(o)
         return super(DecimalEncoder, self).default(o)
 
+def to_plain(value):
+    """Convert DynamoDB values (Decimal, sets) to plain JSON types in one pass"""
+    value_type = type(value)
+    if value_type is str:
+        return value
+    if value_type is Decimal:
+        # Keep whole numbers as ints (confidence 90 -> 90, not 90.0)
+        return int(value) if value == value.to_integral_value() else float(value)
+    if value_type is dict:
+        return {k: to_plain(v) for k, v in value.items()}
+    if value_type is list or value_type is set:
+        return [to_plain(v) for v in value]
+    return value
 
-# JSON Configuration for regex patterns
+def plain_product(product, size='full'):
+    """Convert a DynamoDB product item to plain types and add its image URL"""
+    plain = {}
+    for key, value in product.items():
+        plain[key] = value if type(value) is str else to_plain(value)
+    
+    image_url = product_image_url(plain, size)
+    if image_url:
+        plain['image_url'] = image_url
+    return plain
+
+def json_dumps(data):
+    """Serialize plain data (see to_plain) with the fastest available backend"""
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data)
+
+
+# JSON Configuration for regex patterns (built-in default, see get_extraction_rules)
 REGEX_CONFIG = {
     "parsing": {
         "regex_patterns": {
@@ -46,7 +230,11 @@ REGEX_CONFIG = {
                 r"(\(01\)[0-9]+\(17\)[0-9]+\(10\)[0-9]+)",
                 r"(\d{8})"
             ]
-        }
+        },
+        # Words printed next to the expiry date on French/English labels
+        "expiry_keywords": r"\b(DLC|DDM|DLUO|EXP|[àa] consommer|best before|use by)\b",
+        "expiry_region_min_score": 0.2,   # neighbour lines further than this from their keyword aren't scanned
+        "product_name_region_lines": 3    # product names are in the largest print
     },
     "confidence_weights": {
         "expiry_date": 40,
@@ -56,6 +244,15 @@ REGEX_CONFIG = {
     }
 }
 
+# Extraction rules can be tuned without a redeploy: a versioned JSON object in S3
+# (same shape as REGEX_CONFIG), re-checked by ETag at most every RULES_REFRESH_SECONDS.
+# Set EXTRACTION_RULES_KEY to an empty string to only use the built-in rules.
+RULES_BUCKET = os.environ.get('EXTRACTION_RULES_BUCKET', BUCKET_NAME)
+RULES_KEY = os.environ.get('EXTRACTION_RULES_KEY', 'config/extraction_rules.json')
+RULES_REFRESH_SECONDS = int(os.environ.get('EXTRACTION_RULES_REFRESH_SECONDS', '60'))
+RULE_CATEGORIES = ('expiry_date', 'product_name', 'quantity', 'barcode')
+_rules_cache = {'rules': None, 'etag': None, 'checked_at': 0.0}
+
 def lambda_handler(event, context):
     print(f"🔍 DEBUG - Full event: {json.dumps(event, indent=2)}")
 
@@ -103,6 +300,11 @@ def lambda_handler(event, context):
         print(f"🌐 Lambda URL Request: {method} {path}")
         return handle_api_request_lambda_url(event, context, headers, method, path)
     
+    # EventBridge schedule or async self-invoke: process photos waiting in the admission queue
+    elif event.get('source') in ('aws.events', DRAIN_EVENT_SOURCE):
+        print(f"⏰ Queue drain ({event['source']})")
+        return handle_scheduled_drain(event, context)
+    
     # Otherwise, treat as Telegram webhook
     else:
         print("📱 Telegram Webhook Request")
@@ -237,34 +439,44 @@ def get_all_products(event, headers):
             query_params = dict(urllib.parse.parse_qsl(event['rawQueryString']))
         
         user_id = query_params.get('user_id')
+        size = query_params.get('size', 'full')
+        if size != 'full' and size not in THUMBNAIL_SIZES:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': f'Unknown image size: {size}',
+                    'available_sizes': ['full'] + list(THUMBNAIL_SIZES)
+                })
+            }
         
-        print(f"📊 Fetching products for user: {user_id}")
+        print(f"📊 Fetching products for user: {user_id} (image size: {size})")
         
         if user_id and user_id != 'demo':
             # Filter by user_id
-            response = table.scan(
+            response = products_store.scan(
                 FilterExpression=boto3.dynamodb.conditions.Attr('user_id').eq(user_id)
             )
         else:
             # Get all products (for demo)
-            response = table.scan()
+            response = products_store.scan()
         
-        products = response['Items']
+        items = response['Items']
+        if size != 'full':
+            ensure_thumbnails(items, size)
         
-        # Add S3 image URLs
-        for product in products:
-            if product.get('image_s3_key'):
-                product['image_url'] = f"https://{BUCKET_NAME}.s3.eu-west-3.amazonaws.com/{product['image_s3_key']}"
+        # Convert to plain types and add S3 image URLs in one pass
+        products = [plain_product(product, size) for product in items]
         
         print(f"✅ Found {len(products)} products")
         
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps({
+            'body': json_dumps({
                 'products': products,
                 'count': len(products)
-            }, cls=DecimalEncoder)
+            })
         }
         
     except Exception as e:
@@ -280,18 +492,16 @@ def get_product(product_id, headers):
     try:
         print(f"🔍 Fetching product: {product_id}")
         
-        response = table.get_item(Key={'product_id': product_id})
+        item = products_store.get(product_id)
         
-        if 'Item' in response:
-            product = response['Item']
-            # Add S3 image URL
-            if product.get('image_s3_key'):
-                product['image_url'] = f"https://{BUCKET_NAME}.s3.eu-west-3.amazonaws.com/{product['image_s3_key']}"
+        if item:
+            # Convert to plain types and add S3 image URL
+            product = plain_product(item)
             
             return {
                 'statusCode': 200,
                 'headers': headers,
-                'body': json.dumps(product, cls=DecimalEncoder)
+                'body': json_dumps(product)
             }
         else:
             return {
@@ -343,14 +553,22 @@ def update_product(product_id, event, headers):
             if expression_names:
                 update_params['ExpressionAttributeNames'] = expression_names
             
-            table.update_item(**update_params)
+            # The dashboard patches its list with the returned item, re-reading
+            # a replica right after the write could still show the old one
+            update_params['ReturnValues'] = 'ALL_NEW'
+            item = products_store.update(**update_params)['Attributes']
+        else:
+            item = products_store.get(product_id, consistent=True)
         
         print(f"✅ Product {product_id} updated successfully")
         
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps({'message': 'Product updated successfully'})
+            'body': json_dumps({
+                'message': 'Product updated successfully',
+                'product': plain_product(item) if item else None
+            })
         }
         
     except Exception as e:
@@ -379,44 +597,12 @@ def handle_telegram_webhook(event, context):
             
             try:
                 # Get REAL expiring products from database
-                response = table.scan(
+                response = products_store.scan(
                     FilterExpression=boto3.dynamodb.conditions.Attr('user_id').eq(str(user_id))
                 )
                 
                 products = response['Items']
-                expiring_products = []
-                
-                # Check which products are actually expiring
-                today = date.today()
-                
-                for product in products:
-                    expiry_str = product.get('expiry_date', '')
-                    if expiry_str and expiry_str != 'Unknown':
-                        try:
-                            # Parse DD/MM/YY format
-                            parts = expiry_str.split('/')
-                            if len(parts) == 3:
-                                day = int(parts[0])
-                                month = int(parts[1])
-                                year = int(parts[2])
-                                
-                                # Convert 2-digit year to 4-digit
-                                if year < 100:
-                                    year += 2000 if year < 50 else 1900
-                                
-                                expiry_date = date(year, month, day)
-                                days_until_expiry = (expiry_date - today).days
-                                
-                                # Include products expiring in next 3 days
-                                if 0 <= days_until_expiry <= 3:
-                                    expiring_products.append({
-                                        'name': product.get('product_name', 'Unknown'),
-                                        'days': days_until_expiry
-                                    })
-                                    
-                        except Exception as e:
-                            print(f"Date parsing error: {e}")
-                            continue
+                expiring_products = find_expiring_products(products, date.today())
                 
                 # Build smart notification message
                 if len(expiring_products) == 0:
@@ -470,20 +656,15 @@ def handle_telegram_webhook(event, context):
                 
                 print(f"📸 Processing photo in Paris region")
                 
-                # Process with Paris infrastructure
-                result = process_product_paris(bot_token, file_id, chat_id)
-                
-                if result:
-                    send_structured_product_result(bot_token, chat_id, result)
-                else:
-                    send_message(bot_token, chat_id, "❌ Could not process image. Try again with better lighting!")
+                handle_photo(bot_token, chat_id, file_id)
             
             elif text:
                 if text.lower() in ['/start', 'start']:
                     welcome_text = "👋 Welcome to ShelfSaver Pro! 🇫🇷\n\n📸 Send product photos for AI-powered expiry tracking\n🔬 Enterprise-grade OCR processing\n📊 Professional data extraction\n\n🗼 Powered by AWS Paris Region!"
                     send_message(bot_token, chat_id, welcome_text)
                 elif text.lower() == '/debug':
-                    debug_info = f"🔧 Debug Info:\n📍 Region: Europe (Paris) eu-west-3\n🪣 Bucket: {BUCKET_NAME}\n🤖 OCR: AWS Textract"
+                    local_ocr = 'on' if local_engine.available() else 'off'
+                    debug_info = f"🔧 Debug Info:\n📍 Region: Europe (Paris) eu-west-3\n🪣 Bucket: {BUCKET_NAME}\n🤖 OCR: {OCR_ROUTING} (local {local_ocr}, Textract below {OCR_ESCALATION_CONFIDENCE}%)\n📐 Rules: {get_extraction_rules()['version']}"
                     send_message(bot_token, chat_id, debug_info)
                 elif text.lower() == '/webapp':
                     # Send web app link
@@ -504,6 +685,359 @@ def handle_telegram_webhook(event, context):
     return {'statusCode': 200, 'body': json.dumps({'status': 'ok', 'region': 'eu-west-3'})}
 
 
+def refill_tokens(tokens, updated_at, now):
+    """Token bucket refill since the last update, capped at the bucket capacity"""
+    elapsed = max(0.0, now - updated_at)
+    return min(CHAT_BUCKET_CAPACITY, tokens + elapsed * CHAT_REFILL_PER_SECOND)
+
+def is_conditional_failure(error):
+    return isinstance(error, ClientError) and error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+class DynamoAdmissionStore:
+    """Per-chat token buckets, global OCR slots and the waiting queue in DynamoDB
+
+    Buckets and slots use optimistic locking on a version attribute so
+    concurrent invocations never over-admit.
+    """
+    
+    def __init__(self, table, retries=5):
+        self.table = table
+        self.retries = retries
+    
+    def take_token(self, chat_id, now):
+        key = {'pk': f"chat#{chat_id}", 'sk': 'bucket'}
+        for _ in range(self.retries):
+            item = self.table.get_item(Key=key, ConsistentRead=True).get('Item')
+            if item:
+                tokens = refill_tokens(float(item['tokens']), float(item['updated_at']), now)
+                version = int(item['version'])
+            else:
+                tokens, version = CHAT_BUCKET_CAPACITY, 0
+            
+            if tokens < 1:
+                return False
+            
+            try:
+                self.table.put_item(
+                    Item={
+                        **key,
+                        'tokens': Decimal(str(round(tokens - 1, 6))),
+                        'updated_at': Decimal(str(round(now, 6))),
+                        'version': version + 1,
+                        'expires_at': int(now) + 86400
+                    },
+                    ConditionExpression='attribute_not_exists(pk) OR version = :version',
+                    ExpressionAttributeValues={':version': version}
+                )
+                return True
+            except Exception as e:
+                if not is_conditional_failure(e):
+                    raise
+        return False
+    
+    def acquire_slot(self, job_id, now):
+        key = {'pk': 'ocr', 'sk': 'slots'}
+        for _ in range(self.retries):
+            item = self.table.get_item(Key=key, ConsistentRead=True).get('Item') or {}
+            version = int(item.get('version', 0))
+            leases = {k: v for k, v in (item.get('leases') or {}).items() if float(v) > now}
+            
+            if len(leases) >= MAX_INFLIGHT_OCR:
+                return False
+            
+            leases[job_id] = int(now) + OCR_SLOT_LEASE_SECONDS
+            try:
+                self.table.put_item(
+                    Item={**key, 'leases': leases, 'version': version + 1},
+                    ConditionExpression='attribute_not_exists(pk) OR version = :version',
+                    ExpressionAttributeValues={':version': version}
+                )
+                return True
+            except Exception as e:
+                if not is_conditional_failure(e):
+                    raise
+        return False
+    
+    def release_slot(self, job_id):
+        self.table.update_item(
+            Key={'pk': 'ocr', 'sk': 'slots'},
+            UpdateExpression='REMOVE leases.#job SET version = version + :one',
+            ExpressionAttributeNames={'#job': job_id},
+            ExpressionAttributeValues={':one': 1}
+        )
+    
+    def enqueue(self, job):
+        self.table.put_item(Item={**job, 'pk': job_partition(job), 'sk': job['queue_key']})
+    
+    def queue_position(self, job):
+        response = self.table.query(
+            KeyConditionExpression=boto3.dynamodb.conditions.Key('pk').eq(job_partition(job)) & boto3.dynamodb.conditions.Key('sk').lte(job['queue_key']),
+            Select='COUNT'
+        )
+        return response['Count']
+    
+    def peek_queue(self, limit, partition=QUEUE_PARTITION):
+        response = self.table.query(
+            KeyConditionExpression=boto3.dynamodb.conditions.Key('pk').eq(partition),
+            Limit=limit
+        )
+        return response['Items']
+    
+    def claim(self, job):
+        """Remove a job from its queue, False if another invocation got it first"""
+        try:
+            self.table.delete_item(
+                Key={'pk': job_partition(job), 'sk': job['queue_key']},
+                ConditionExpression='attribute_exists(pk)'
+            )
+            return True
+        except Exception as e:
+            if is_conditional_failure(e):
+                return False
+            raise
+
+admission_store = DynamoAdmissionStore(admission_table)
+
+def job_partition(job):
+    return PARKED_PARTITION if job.get('parked') else QUEUE_PARTITION
+
+def new_ocr_job(chat_id, file_id):
+    now = time.time()
+    job_id = str(uuid.uuid4())
+    return {
+        'job_id': job_id,
+        'chat_id': str(chat_id),
+        'file_id': file_id,
+        'queue_key': f"{now:017.6f}#{job_id}",
+        'enqueued_at': Decimal(str(round(now, 6)))
+    }
+
+def admit_ocr_job(job):
+    """Try to start a job now: needs a chat token and a global OCR slot"""
+    now = time.time()
+    try:
+        if not admission_store.acquire_slot(job['job_id'], now):
+            print(f"🚦 OCR at capacity ({MAX_INFLIGHT_OCR} in flight)")
+            return False
+    except Exception as e:
+        # Never lose a photo because the admission table is unavailable
+        print(f"⚠️ Admission check failed, admitting anyway: {e}")
+        job['admission_bypassed'] = True
+        return True
+    
+    try:
+        if not admission_store.take_token(job['chat_id'], now):
+            print(f"🚦 Chat {job['chat_id']} is over its photo rate")
+            admission_store.release_slot(job['job_id'])
+            return False
+        return True
+    except Exception as e:
+        # We hold a slot at this point, give it back before failing open
+        print(f"⚠️ Token check failed, admitting anyway: {e}")
+        release_ocr_job(job)
+        job['admission_bypassed'] = True
+        return True
+
+def release_ocr_job(job):
+    if job.get('admission_bypassed'):
+        return
+    try:
+        admission_store.release_slot(job['job_id'])
+    except Exception as e:
+        print(f"⚠️ Could not release OCR slot {job['job_id']}: {e}")
+
+def run_ocr_job(bot_token, job):
+    """Process an admitted job and reply to its chat, always frees the OCR slot"""
+    try:
+        # Process with Paris infrastructure (parked jobs restart from the stored image)
+        result = process_product_paris(bot_token, job['file_id'], job['chat_id'], job.get('image_s3_key'), job.get('thumbnails'))
+        
+        if result and result.get('parked'):
+            park_ocr_job(bot_token, job, result)
+        elif result:
+            send_structured_product_result(bot_token, job['chat_id'], result)
+        else:
+            send_message(bot_token, job['chat_id'], "❌ Could not process image. Try again with better lighting!")
+    finally:
+        release_ocr_job(job)
+
+def park_ocr_job(bot_token, job, parked):
+    """Put a job whose image is stored back in the queue until Textract recovers"""
+    attempts = int(job.get('attempts', 0)) + 1
+    if attempts > PARK_MAX_ATTEMPTS:
+        print(f"💥 Giving up on parked job {job['queue_key']} after {attempts - 1} attempts")
+        send_message(bot_token, job['chat_id'], "❌ Could not process image. Try again with better lighting!")
+        return
+    
+    parked_job = {
+        key: value for key, value in job.items() if key not in ('pk', 'sk', 'admission_bypassed')
+    }
+    parked_job.update({
+        'image_s3_key': parked['image_s3_key'],
+        'thumbnails': parked.get('thumbnails') or {},
+        'parked': True,
+        'attempts': attempts
+    })
+    
+    try:
+        # Same queue_key, so the job keeps its place in line once Textract is back
+        admission_store.enqueue(parked_job)
+        emit_metric('ParkedJobs', 1)
+        print(f"⏸️ Parked job {parked_job['queue_key']} (attempt {attempts})")
+        if attempts == 1:
+            send_message(bot_token, job['chat_id'], "⏸️ Text recognition is busy right now.\n📦 Your photo is saved and will be retried automatically - no need to resend it!")
+    except Exception as e:
+        print(f"💥 Could not park job: {e}")
+        send_message(bot_token, job['chat_id'], "❌ Could not process image. Try again with better lighting!")
+
+def request_queue_drain():
+    """A slot just freed up: if photos are waiting, drain them in a separate async invocation"""
+    function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+    if not function_name:
+        return
+    try:
+        waiting = admission_store.peek_queue(1)
+        if not waiting and textract_available():
+            waiting = admission_store.peek_queue(1, PARKED_PARTITION)
+        if not waiting:
+            return
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='Event',
+            Payload=json.dumps({'source': DRAIN_EVENT_SOURCE}).encode()
+        )
+        print("📤 Queue drain requested")
+    except Exception as e:
+        # The EventBridge schedule picks the queue up anyway
+        print(f"⚠️ Could not request queue drain: {e}")
+
+def handle_photo(bot_token, chat_id, file_id):
+    """Run a photo now if admitted, otherwise queue it and tell the user where it stands"""
+    job = new_ocr_job(chat_id, file_id)
+    
+    if admit_ocr_job(job):
+        run_ocr_job(bot_token, job)
+        request_queue_drain()
+        return
+    
+    try:
+        admission_store.enqueue(job)
+        position = admission_store.queue_position(job)
+        print(f"⏳ Queued job {job['job_id']} at position {position}")
+        send_message(bot_token, chat_id, f"⏳ Lots of photos right now - yours is queued, position {position}.\n📬 I'll send the result as soon as it's processed!")
+    except Exception as e:
+        print(f"💥 Could not queue photo: {e}")
+        send_message(bot_token, chat_id, "⏳ Too many photos at once - please resend this one in a minute!")
+
+def has_time_left(context):
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return True
+    return context.get_remaining_time_in_millis() > DRAIN_MIN_REMAINING_MS
+
+def next_queued_job():
+    """Claim the oldest queued job whose chat has a token, holding an OCR slot for it"""
+    now = time.time()
+    slot_id = str(uuid.uuid4())
+    if not admission_store.acquire_slot(slot_id, now):
+        return None
+    
+    jobs = admission_store.peek_queue(DRAIN_PEEK_SIZE)
+    if textract_available():
+        # Parked jobs live in their own partition so an outage backlog never
+        # pushes new photos out of the peek window, merge them back by age
+        jobs = sorted(jobs + admission_store.peek_queue(DRAIN_PEEK_SIZE, PARKED_PARTITION), key=lambda job: job['queue_key'])
+    
+    # Claim before taking the token so a job another invocation got first
+    # doesn't cost its chat a token. Parked jobs already paid theirs, other
+    # chats that are still over their rate are put back (same queue_key, so
+    # same place) and skipped for the rest of the window so one flood can't
+    # block the queue or cost a bucket read per queued photo
+    refused_chats = set()
+    for job in jobs:
+        if job['chat_id'] in refused_chats or not admission_store.claim(job):
+            continue
+        try:
+            admitted = job.get('parked') or admission_store.take_token(job['chat_id'], now)
+        except Exception:
+            admission_store.enqueue(job)
+            raise
+        if admitted:
+            job['job_id'] = slot_id
+            return job
+        admission_store.enqueue(job)
+        refused_chats.add(job['chat_id'])
+    
+    admission_store.release_slot(slot_id)
+    return None
+
+def drain_ocr_queue(bot_token, context=None, max_jobs=DRAIN_BATCH_SIZE):
+    """Process queued photos while there is capacity and time left"""
+    processed = 0
+    try:
+        while processed < max_jobs and has_time_left(context):
+            job = next_queued_job()
+            if not job:
+                break
+            print(f"📤 Running queued job for chat {job['chat_id']}")
+            run_ocr_job(bot_token, job)
+            processed += 1
+    except Exception as e:
+        print(f"⚠️ Queue drain stopped: {e}")
+    return processed
+
+def handle_scheduled_drain(event, context):
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    if not bot_token:
+        return {'statusCode': 500, 'body': 'Bot token not configured'}
+    
+    processed = drain_ocr_queue(bot_token, context)
+    print(f"✅ Drained {processed} queued job(s)")
+    return {'statusCode': 200, 'body': json.dumps({'drained': processed})}
+
+def parse_expiry_date(expiry_str):
+    """Parse a stored DD/MM/YY(YY) expiry date, None if it can't be read"""
+    if not expiry_str or expiry_str == 'Unknown':
+        return None
+    
+    try:
+        parts = expiry_str.split('/')
+        if len(parts) != 3:
+            return None
+        
+        day = int(parts[0])
+        month = int(parts[1])
+        year = int(parts[2])
+        
+        # Convert 2-digit year to 4-digit
+        if year < 100:
+            year += 2000 if year < 50 else 1900
+        
+        return date(year, month, day)
+    
+    except Exception as e:
+        print(f"Date parsing error: {e}")
+        return None
+
+def find_expiring_products(products, today, window_days=3):
+    """Return name/days for products expiring within the next few days"""
+    expiring_products = []
+    
+    for product in products:
+        expiry_date = parse_expiry_date(product.get('expiry_date', ''))
+        if expiry_date is None:
+            continue
+        
+        days_until_expiry = (expiry_date - today).days
+        
+        # Include products expiring in next 3 days
+        if 0 <= days_until_expiry <= window_days:
+            expiring_products.append({
+                'name': product.get('product_name', 'Unknown'),
+                'days': days_until_expiry
+            })
+    
+    return expiring_products
+
 def adjust_expiry_for_demo(expiry_date):
     """Convert old dates to demo-friendly dates"""
     if expiry_date:
@@ -545,13 +1079,16 @@ def save_to_database(result, chat_id):
             'confidence': result['confidence'],
             'raw_text': result['raw_text'],
             'image_s3_key': result['image_s3_key'],
+            'thumbnails': result.get('thumbnails', {}),
+            'ocr_provider': result.get('ocr_provider', ''),
+            'rules_version': result.get('rules_version', ''),
             'user_id': str(chat_id),
             'created_at': datetime.now().isoformat(),
             'status': 'pending'
         }
         
         # Save to database
-        table.put_item(Item=item)
+        products_store.put(item)
         print(f"✅ Saved to database: {product_id}")
         return product_id
         
@@ -559,35 +1096,50 @@ def save_to_database(result, chat_id):
         print(f"❌ Database save failed: {e}")
         return None
 
-def process_product_paris(bot_token, file_id, chat_id):
-    """Process product with Paris region infrastructure"""
+def process_product_paris(bot_token, file_id, chat_id, image_s3_key=None, thumbnails=None):
+    """Process product with Paris region infrastructure
+
+    Pass image_s3_key to resume a parked job from the already stored image.
+    Returns {'parked': True, ...} when Textract is unavailable.
+    """
     try:
-        send_message(bot_token, chat_id, "🔬 AI Analysis Starting... 🇫🇷\n📸 Image → 📝 Textract Paris → 🧠 Pattern Match")
-        
-        # Step 1: Download and store in Paris S3
-        image_s3_key = store_telegram_image_paris(bot_token, file_id)
+        image_data = None
         if not image_s3_key:
-            return None
+            send_message(bot_token, chat_id, "🔬 AI Analysis Starting... 🇫🇷\n📸 Image → 📝 Textract Paris → 🧠 Pattern Match")
+            
+            # Step 1: Download and store in Paris S3
+            stored = store_telegram_image_paris(bot_token, file_id)
+            if not stored:
+                return None
+            image_s3_key, image_data = stored
+            
+            # Thumbnails for the dashboard (skipped if Pillow isn't available)
+            thumbnails = generate_thumbnails(file_id, image_data)
         
-        # Step 2: Extract text with Paris Textract
-        raw_text = extract_text_textract_paris(image_s3_key)
-        if not raw_text:
+        # Step 2 + 3: OCR (local engine first, Textract Paris when needed) and regex patterns
+        try:
+            ocr = run_ocr(image_s3_key, image_data)
+        except TextractUnavailable as e:
+            print(f"⏸️ Textract unavailable, parking {image_s3_key}: {e}")
+            return {'parked': True, 'image_s3_key': image_s3_key, 'thumbnails': thumbnails or {}}
+        if not ocr:
             return None
+        raw_text = ocr['raw_text']
+        structured_data = ocr['structured_data']
             
-        # Step 3: Store raw text in Paris S3
+        # Step 4: Store raw text and OCR lines in Paris S3 (lines let a backfill re-run the same extraction)
         text_s3_key = store_raw_text_paris(file_id, raw_text)
-        
-        # Step 4: Apply regex patterns
-        structured_data = apply_json_regex_patterns(raw_text)
+        store_ocr_lines_paris(file_id, ocr['lines'])
         
         # Step 5: Build result
         result = {
             'file_id': file_id,
             'image_s3_key': image_s3_key,
+            'thumbnails': thumbnails or {},
             'text_s3_key': text_s3_key,
             'raw_text': raw_text[:300],
             'region': 'eu-west-3',
-            'ocr_provider': 'AWS Textract Paris',
+            'ocr_provider': ocr['engine'],
             **structured_data
         }
         
@@ -633,49 +1185,375 @@ def store_telegram_image_paris(bot_token, file_id):
         )
         
         print(f"✅ Stored in Paris S3: {BUCKET_NAME}/{s3_key}")
-        return s3_key
+        return s3_key, image_data
         
     except Exception as e:
         print(f"💥 Error storing in Paris: {e}")
         return None
 
-def extract_text_textract_paris(s3_key):
-    """Extract text using AWS Textract in Paris"""
+def generate_thumbnails(file_id, image_data, sizes=None):
+    """Resize an image and store thumbnails in S3, returns {size: s3_key}"""
+    thumbnails = {}
+    if Image is None:
+        print("⚠️ Pillow not available - skipping thumbnails")
+        return thumbnails
+    
     try:
-        print(f"🔍 Running Textract in Paris on {BUCKET_NAME}/{s3_key}")
+        original = Image.open(io.BytesIO(image_data))
+        original = original.convert('RGB')
+        
+        for size in sizes or THUMBNAIL_SIZES:
+            edge = THUMBNAIL_SIZES[size]
+            thumb = original.copy()
+            thumb.thumbnail((edge, edge))
+            
+            buffer = io.BytesIO()
+            thumb.save(buffer, format='JPEG', quality=80, optimize=True, progressive=True)
+            
+            thumb_key = f"thumbs/{size}/{file_id}.jpg"
+            s3.put_object(
+                Bucket=BUCKET_NAME,
+                Key=thumb_key,
+                Body=buffer.getvalue(),
+                ContentType='image/jpeg',
+                CacheControl=IMAGE_CACHE_CONTROL
+            )
+            thumbnails[size] = thumb_key
+        
+        print(f"🖼️ Thumbnails stored: {list(thumbnails)}")
+        
+    except Exception as e:
+        print(f"⚠️ Thumbnail generation failed: {e}")
+    
+    return thumbnails
+
+def ensure_thumbnails(products, size):
+    """Lazily create a missing thumbnail size for products scanned before thumbnails existed"""
+    if Image is None:
+        return
+    
+    created = 0
+    for product in products:
+        thumbnails = product.get('thumbnails') or {}
+        if size in thumbnails or not product.get('image_s3_key') or not product.get('file_id'):
+            continue
+        
+        # Bound the extra latency on a single request, the rest get done next time
+        if created >= LAZY_THUMBNAILS_PER_REQUEST:
+            break
+        created += 1
         
-        response = textract.detect_document_text(
-            Document={
-                'S3Object': {
-                    'Bucket': BUCKET_NAME,
-                    'Name': s3_key
+        try:
+            original = s3.get_object(Bucket=BUCKET_NAME, Key=product['image_s3_key'])
+            new_thumbnails = generate_thumbnails(product['file_id'], original['Body'].read(), [size])
+            if not new_thumbnails:
+                continue
+            
+            thumbnails.update(new_thumbnails)
+            product['thumbnails'] = thumbnails
+            products_store.update(
+                Key={'product_id': product['product_id']},
+                UpdateExpression='SET thumbnails = :thumbnails',
+                ExpressionAttributeValues={':thumbnails': thumbnails}
+            )
+        except Exception as e:
+            print(f"⚠️ Lazy thumbnail failed for {product.get('product_id')}: {e}")
+
+def s3_signing_credentials():
+    """Frozen credentials of the Lambda role, None when there are none (local runs)"""
+    if not _signing_state['resolved']:
+        _signing_state['credentials'] = boto3.session.Session().get_credentials()
+        _signing_state['resolved'] = True
+    credentials = _signing_state['credentials']
+    return credentials.get_frozen_credentials() if credentials else None
+
+def sigv4_quote(value, safe='-_.~'):
+    return urllib.parse.quote(value, safe=safe)
+
+def presigned_image_url(s3_key, now=None):
+    """Pre-signed GET URL (SigV4 query auth), the same for every request in a signing window
+
+    The signing time is rounded down to IMAGE_URL_SIGNING_WINDOW_SECONDS, so
+    repeated product lists return identical URLs (across containers too) and
+    the browser cache keeps hitting. Signed here rather than with
+    generate_presigned_url, which always signs at the current time.
+    """
+    credentials = s3_signing_credentials()
+    if credentials is None:
+        return IMAGE_URL_PREFIX + s3_key
+    
+    now = time.time() if now is None else now
+    amz_date = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now - now % IMAGE_URL_SIGNING_WINDOW_SECONDS))
+    scope = f"{amz_date[:8]}/eu-west-3/s3/aws4_request"
+    
+    # Signing key and query string only depend on the window and the credentials
+    window_id = (amz_date, credentials.access_key, credentials.token)
+    if _signing_state['window_id'] != window_id:
+        key = ('AWS4' + credentials.secret_key).encode()
+        for part in scope.split('/'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        
+        params = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f"{credentials.access_key}/{scope}",
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': str(IMAGE_URL_EXPIRY_SECONDS),
+            'X-Amz-SignedHeaders': 'host',
+            'response-cache-control': IMAGE_CACHE_CONTROL
+        }
+        if credentials.token:
+            params['X-Amz-Security-Token'] = credentials.token
+        query = '&'.join(f"{sigv4_quote(k)}={sigv4_quote(v)}" for k, v in sorted(params.items()))
+        _signing_state.update(window_id=window_id, key=key, query=query)
+    
+    query = _signing_state['query']
+    path = '/' + sigv4_quote(s3_key, safe='/-_.~')
+    canonical_request = f"GET\n{path}\n{query}\nhost:{IMAGE_URL_HOST}\n\nhost\nUNSIGNED-PAYLOAD"
+    string_to_sign = f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+    signature = hmac.new(_signing_state['key'], string_to_sign.encode(), hashlib.sha256).hexdigest()
+    return f"https://{IMAGE_URL_HOST}{path}?{query}&X-Amz-Signature={signature}"
+
+def product_image_url(product, size='full'):
+    """Image URL for a product in the requested size, falls back to the original"""
+    image_s3_key = product.get('image_s3_key')
+    if not image_s3_key:
+        return None
+    
+    thumbnails = product.get('thumbnails') or {}
+    return presigned_image_url(thumbnails.get(size, image_s3_key))
+
+class TextractUnavailable(Exception):
+    """Textract is throttling, timing out or the circuit breaker is open"""
+
+def emit_metric(name, value, unit='Count', **dimensions):
+    """Publish a CloudWatch metric through the Embedded Metric Format (just a log line)"""
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': 'ShelfSaver',
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit}]
+            }]
+        },
+        name: value,
+        **dimensions
+    }))
+
+def textract_available():
+    """Circuit breaker check: closed, or open long enough to allow a trial call"""
+    if _textract_breaker['state'] == 'open':
+        if time.time() - _textract_breaker['opened_at'] < TEXTRACT_BREAKER_COOLDOWN_SECONDS:
+            return False
+        set_breaker_state('half_open')
+    return True
+
+def set_breaker_state(state):
+    if _textract_breaker['state'] != state:
+        print(f"🔌 Textract circuit breaker: {_textract_breaker['state']} -> {state}")
+        _textract_breaker['state'] = state
+        emit_metric('TextractBreakerOpen', 0 if state == 'closed' else 1, unit='None', State=state)
+    if state == 'open':
+        _textract_breaker['opened_at'] = time.time()
+
+def record_textract_result(success):
+    if success:
+        _textract_breaker['failures'] = 0
+        set_breaker_state('closed')
+        return
+    
+    _textract_breaker['failures'] += 1
+    # A failed trial call re-opens immediately
+    if _textract_breaker['state'] == 'half_open' or _textract_breaker['failures'] >= TEXTRACT_BREAKER_THRESHOLD:
+        set_breaker_state('open')
+
+def is_retryable_textract_error(error):
+    if isinstance(error, ClientError):
+        return error.response['Error']['Code'] in TEXTRACT_RETRYABLE_ERRORS
+    # Connect/read timeouts and dropped connections
+    return isinstance(error, (ConnectTimeoutError, ReadTimeoutError, EndpointConnectionError, ConnectionClosedError))
+
+def call_textract(s3_key):
+    """detect_document_text with jittered retries on throttling/timeouts and a circuit breaker"""
+    if not textract_available():
+        raise TextractUnavailable('circuit breaker open')
+    
+    started = time.time()
+    # Worst case for one more attempt: it connects slowly and then times out
+    attempt_seconds = textract.meta.config.connect_timeout + textract.meta.config.read_timeout
+    for attempt in range(TEXTRACT_MAX_ATTEMPTS):
+        try:
+            response = textract.detect_document_text(
+                Document={
+                    'S3Object': {
+                        'Bucket': BUCKET_NAME,
+                        'Name': s3_key
+                    }
                 }
-            }
-        )
+            )
+            record_textract_result(True)
+            emit_metric('TextractRetries', attempt)
+            return response
+        
+        except Exception as e:
+            if not is_retryable_textract_error(e):
+                # Bad document etc. - retrying won't help and it isn't an outage
+                raise
+            
+            # Full jitter backoff, only if the retry can time out and still end within the budget
+            delay = random.uniform(0, min(TEXTRACT_RETRY_MAX_SECONDS, TEXTRACT_RETRY_BASE_SECONDS * 2 ** attempt))
+            out_of_time = time.time() - started + delay + attempt_seconds > TEXTRACT_RETRY_BUDGET_SECONDS
+            if attempt == TEXTRACT_MAX_ATTEMPTS - 1 or out_of_time:
+                record_textract_result(False)
+                emit_metric('TextractRetries', attempt)
+                raise TextractUnavailable(str(e))
+            
+            print(f"🔁 Textract attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+def lines_to_text(lines):
+    return '\n'.join(line['text'] for line in lines)
+
+def textract_block_to_dict(block):
+    box = block.get('Geometry', {}).get('BoundingBox', {})
+    return {
+        'text': block['Text'],
+        'confidence': block.get('Confidence', 0.0),
+        'bbox': {
+            'left': box.get('Left', 0.0),
+            'top': box.get('Top', 0.0),
+            'width': box.get('Width', 0.0),
+            'height': box.get('Height', 0.0)
+        }
+    }
+
+class TextractOcrEngine:
+    """AWS Textract in Paris (network round-trip, billed per page)"""
+    name = 'AWS Textract Paris'
+    
+    def available(self):
+        return textract_available()
+    
+    def detect_lines(self, s3_key, image_data=None):
+        """Return [{'text', 'confidence' (0-100), 'bbox': {left, top, width, height} (0-1)}]"""
+        print(f"🔍 Running Textract in Paris on {BUCKET_NAME}/{s3_key}")
+        
+        response = call_textract(s3_key)
         
         print(f"✅ Textract Paris success! Found {len(response['Blocks'])} blocks")
         
-        # Extract text
-        text_lines = []
+        lines = []
         for block in response['Blocks']:
             if block['BlockType'] == 'LINE':
-                text_lines.append(block['Text'])
+                lines.append(textract_block_to_dict(block))
                 print(f"📝 Line: '{block['Text']}'")
+        return lines
+
+class LocalOcrEngine:
+    """Tesseract on the Lambda CPU, free and offline - good enough for high-contrast DLC stamps"""
+    name = 'Tesseract (local)'
+    
+    def available(self):
+        return pytesseract is not None and Image is not None
+    
+    def detect_lines(self, s3_key, image_data=None):
+        if image_data is None:
+            image_data = s3.get_object(Bucket=BUCKET_NAME, Key=s3_key)['Body'].read()
+        
+        print(f"🔍 Running local OCR on {s3_key}")
+        image = Image.open(io.BytesIO(image_data)).convert('L')
+        width, height = image.size
+        data = pytesseract.image_to_data(image, lang=LOCAL_OCR_LANGUAGES, output_type=pytesseract.Output.DICT)
+        
+        # Tesseract reports words, group them back into lines
+        grouped = {}
+        for i, word in enumerate(data['text']):
+            confidence = float(data['conf'][i])
+            if not word.strip() or confidence < 0:
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            grouped.setdefault(key, []).append((
+                word, confidence,
+                data['left'][i], data['top'][i], data['left'][i] + data['width'][i], data['top'][i] + data['height'][i]
+            ))
+        
+        lines = []
+        for key in sorted(grouped):
+            words = grouped[key]
+            left = min(w[2] for w in words)
+            top = min(w[3] for w in words)
+            right = max(w[4] for w in words)
+            bottom = max(w[5] for w in words)
+            lines.append({
+                'text': ' '.join(w[0] for w in words),
+                'confidence': sum(w[1] for w in words) / len(words),
+                'bbox': {
+                    'left': left / width,
+                    'top': top / height,
+                    'width': (right - left) / width,
+                    'height': (bottom - top) / height
+                }
+            })
         
-        raw_text = '\n'.join(text_lines)
-        print(f"✅ Extracted {len(raw_text)} characters")
+        print(f"✅ Local OCR found {len(lines)} lines")
+        return lines
+
+textract_engine = TextractOcrEngine()
+local_engine = LocalOcrEngine()
+
+def ocr_with_engine(engine, s3_key, image_data=None):
+    """Run one engine and the regex patterns, None if it found no text"""
+    lines = engine.detect_lines(s3_key, image_data)
+    raw_text = lines_to_text(lines)
+    print(f"✅ {engine.name} extracted {len(raw_text)} characters")
+    
+    if not raw_text.strip():
+        print("⚠️ No text extracted - image might be unclear")
+        return None
+    
+    return {
+        'engine': engine.name,
+        'lines': lines,
+        'raw_text': raw_text,
+        'structured_data': apply_json_regex_patterns(raw_text, lines)
+    }
+
+def run_ocr(s3_key, image_data=None):
+    """OCR routing: local engine first, escalate to Textract when extraction confidence is low
+
+    Raises TextractUnavailable (the job gets parked) unless the local result
+    reaches OCR_OUTAGE_MIN_CONFIDENCE.
+    """
+    local_result = None
+    if OCR_ROUTING == 'local_first' and local_engine.available():
+        try:
+            local_result = ocr_with_engine(local_engine, s3_key, image_data)
+        except Exception as e:
+            print(f"⚠️ Local OCR failed: {e}")
         
-        if not raw_text.strip():
-            print("⚠️ No text extracted - image might be unclear")
-            return None
-            
-        return raw_text
+        if local_result and local_result['structured_data']['confidence'] >= OCR_ESCALATION_CONFIDENCE:
+            emit_metric('OcrRouted', 1, Engine='local')
+            return local_result
         
+        confidence = local_result['structured_data']['confidence'] if local_result else 0
+        print(f"⬆️ Escalating to Textract (local confidence {confidence} < {OCR_ESCALATION_CONFIDENCE})")
+    
+    try:
+        result = ocr_with_engine(textract_engine, s3_key, image_data)
+        emit_metric('OcrRouted', 1, Engine='textract')
+    except TextractUnavailable:
+        if local_result and local_result['structured_data']['confidence'] >= OCR_OUTAGE_MIN_CONFIDENCE:
+            print("⚠️ Textract unavailable, keeping the local result")
+            emit_metric('OcrRouted', 1, Engine='local')
+            return local_result
+        raise
     except Exception as e:
         print(f"💥 Textract Paris error: {e}")
         import traceback
         print(f"💥 Traceback: {traceback.format_exc()}")
-        return None
+        return local_result
+    
+    return result or local_result
 
 def store_raw_text_paris(file_id, text):
     """Store raw OCR text in Paris S3"""
@@ -693,12 +1571,159 @@ def store_raw_text_paris(file_id, text):
         print(f"Error storing text in Paris: {e}")
         return f"text/{file_id}.txt"
 
-def apply_json_regex_patterns(text):
-    """Apply JSON regex patterns to extract structured data"""
+def store_ocr_lines_paris(file_id, lines):
+    """Store OCR lines (text, confidence, bbox) next to the raw text in Paris S3"""
+    try:
+        lines_s3_key = f"text/{file_id}.lines.json"
+        s3.put_object(
+            Bucket=BUCKET_NAME,
+            Key=lines_s3_key,
+            Body=json_dumps([
+                {'text': line['text'], 'confidence': line['confidence'], 'bbox': line['bbox']}
+                for line in lines
+            ]).encode('utf-8'),
+            ContentType='application/json'
+        )
+        print(f"✅ OCR lines stored in Paris: {lines_s3_key}")
+        return lines_s3_key
+    except Exception as e:
+        print(f"Error storing OCR lines in Paris: {e}")
+        return None
+
+def is_number(value):
+    # JSON true/false load as bool, which is an int subclass
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def compile_rules(config, version):
+    """Validate a rules config (REGEX_CONFIG shape) and compile its patterns once
+
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(config, dict):
+        raise ValueError('rules must be a JSON object')
+    
+    parsing = config.get('parsing') or {}
+    patterns = parsing.get('regex_patterns')
+    weights = config.get('confidence_weights')
+    if not isinstance(patterns, dict) or not isinstance(weights, dict):
+        raise ValueError('rules need parsing.regex_patterns and confidence_weights')
+    
+    compiled = {}
+    for category in RULE_CATEGORIES:
+        pattern_list = patterns.get(category)
+        if not isinstance(pattern_list, list) or not pattern_list:
+            raise ValueError(f'{category}: needs a non-empty list of patterns')
+        
+        compiled[category] = []
+        for pattern in pattern_list:
+            if not isinstance(pattern, str):
+                raise ValueError(f'{category}: patterns must be strings')
+            try:
+                compiled[category].append(re.compile(pattern, re.IGNORECASE | re.MULTILINE))
+            except re.error as e:
+                raise ValueError(f'{category}: invalid pattern {pattern!r}: {e}')
+        
+        # Confidence is stored in DynamoDB, which rejects Python floats
+        if not is_integer(weights.get(category)):
+            raise ValueError(f'{category}: confidence weight must be an integer')
+    
+    # Geometry settings are optional, rule sets written before them keep the built-in values
+    defaults = REGEX_CONFIG['parsing']
+    keywords = parsing.get('expiry_keywords', defaults['expiry_keywords'])
+    if not isinstance(keywords, str) or not keywords:
+        raise ValueError('expiry_keywords must be a non-empty pattern string')
+    try:
+        compiled_keywords = re.compile(keywords, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f'expiry_keywords: invalid pattern {keywords!r}: {e}')
+    
+    min_score = parsing.get('expiry_region_min_score', defaults['expiry_region_min_score'])
+    if not is_number(min_score) or not 0 <= min_score <= 1:
+        raise ValueError('expiry_region_min_score must be a number between 0 and 1')
+    
+    name_lines = parsing.get('product_name_region_lines', defaults['product_name_region_lines'])
+    if not is_integer(name_lines) or name_lines < 1:
+        raise ValueError('product_name_region_lines must be a positive integer')
+    
+    return {
+        'version': version,
+        'patterns': compiled,
+        'weights': {category: weights[category] for category in RULE_CATEGORIES},
+        'expiry_keywords': compiled_keywords,
+        'expiry_region_min_score': min_score,
+        'product_name_region_lines': name_lines
+    }
+
+def load_rules_from_s3(version_id=None, etag=None):
+    """Fetch and compile the rules object, None if unchanged since etag
+
+    The recorded version is the S3 VersionId (or the ETag on an unversioned bucket).
+    """
+    params = {'Bucket': RULES_BUCKET, 'Key': RULES_KEY}
+    if version_id:
+        params['VersionId'] = version_id
+    if etag:
+        params['IfNoneMatch'] = etag
+    
+    try:
+        response = s3.get_object(**params)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('304', 'NotModified'):
+            return None
+        raise
+    
+    config = json.loads(response['Body'].read())
+    response_etag = response['ETag']
+    rules = compile_rules(config, response.get('VersionId') or response_etag.strip('"'))
+    rules['etag'] = response_etag
+    return rules
+
+BUILTIN_RULES = compile_rules(REGEX_CONFIG, 'builtin')
+
+def get_extraction_rules():
+    """Compiled rules for this container, refreshed from S3 by ETag every RULES_REFRESH_SECONDS
+
+    Bad or unreachable rule sets keep the current rules (built-in at worst).
+    """
+    now = time.time()
+    if not RULES_KEY:
+        return BUILTIN_RULES
+    if _rules_cache['rules'] and now - _rules_cache['checked_at'] < RULES_REFRESH_SECONDS:
+        return _rules_cache['rules']
+    
+    _rules_cache['checked_at'] = now
     try:
-        config = REGEX_CONFIG
-        patterns = config['parsing']['regex_patterns']
-        weights = config['confidence_weights']
+        rules = load_rules_from_s3(etag=_rules_cache['etag'])
+        if rules:
+            print(f"📐 Loaded extraction rules version {rules['version']}")
+            _rules_cache['rules'] = rules
+            _rules_cache['etag'] = rules['etag']
+    except Exception as e:
+        print(f"⚠️ Could not refresh extraction rules, keeping {(_rules_cache['rules'] or BUILTIN_RULES)['version']}: {e}")
+    
+    if not _rules_cache['rules']:
+        _rules_cache['rules'] = BUILTIN_RULES
+    return _rules_cache['rules']
+
+def apply_json_regex_patterns(text, lines=None, rules=None):
+    """Apply JSON regex patterns to extract structured data
+
+    With OCR lines (geometry + confidence) only the regions near expiry
+    keywords are scanned and confidence comes from the OCR evidence.
+    Uses the current extraction rules unless compiled rules are given.
+    """
+    rules = rules or get_extraction_rules()
+    try:
+        patterns = rules['patterns']
+        weights = rules['weights']
+        
+        if lines:
+            result = apply_patterns_with_geometry(lines, rules, text)
+            result['rules_version'] = rules['version']
+            return result
         
         result = {
             'product_name': None,
@@ -706,16 +1731,17 @@ def apply_json_regex_patterns(text):
             'quantity': None,
             'barcode': None,
             'confidence': 0,
-            'extraction_details': {}
+            'extraction_details': {},
+            'rules_version': rules['version']
         }
         
         # Apply patterns
         for category, pattern_list in patterns.items():
             for pattern in pattern_list:
-                matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
+                matches = pattern.findall(text)
                 if matches:
                     result['extraction_details'][category] = {
-                        'pattern': pattern,
+                        'pattern': pattern.pattern,
                         'matches': matches[:3]
                     }
                     
@@ -759,9 +1785,182 @@ def apply_json_regex_patterns(text):
             'quantity': None,
             'barcode': None,
             'confidence': 20,
-            'extraction_details': {'error': str(e)}
+            'extraction_details': {'error': str(e)},
+            'rules_version': rules['version']
         }
 
+def line_center(line):
+    box = line['bbox']
+    return box['left'] + box['width'] / 2, box['top'] + box['height'] / 2
+
+def rank_expiry_lines(lines, keywords, min_score):
+    """Yield the lines worth scanning for the expiry date, best evidence first, with a 0-1 proximity score
+
+    Keyword lines score 1 and always come first, a date printed on the
+    keyword line is the expiry date even when a production date sits right
+    next to it. The lines just before/after a keyword line (date printed
+    under or beside its keyword) follow, scoring below 1 and decaying with
+    their distance in keyword line heights. Nothing without any keyword.
+    Neighbours are only scored if the caller is still looking.
+    """
+    keyword_indexes = [n for n, line in enumerate(lines) if keywords.search(line['text'])]
+    if not keyword_indexes:
+        return
+    
+    if len(keyword_indexes) > 1:
+        keyword_indexes.sort(key=lambda n: -lines[n]['confidence'])
+    for n in keyword_indexes:
+        yield lines[n], 1.0
+    
+    keyword_set = set(keyword_indexes)
+    neighbours = {}
+    for n in keyword_indexes:
+        kx, ky = line_center(lines[n])
+        unit = max(lines[n]['bbox']['height'], 0.01)
+        for m in (n - 1, n + 1):
+            if m < 0 or m >= len(lines) or m in keyword_set:
+                continue
+            x, y = line_center(lines[m])
+            distance = ((x - kx) ** 2 + (y - ky) ** 2) ** 0.5 / unit
+            # Capped below the keyword line's 1 so the evidence says which line held the date
+            score = 0.9 / (1 + max(0.0, distance - 1.5) / 2)
+            if score >= min_score and score > neighbours.get(m, 0.0):
+                neighbours[m] = score
+    
+    # Then best evidence: proximity x OCR confidence
+    for m in sorted(neighbours, key=lambda m: -neighbours[m] * lines[m]['confidence']):
+        yield lines[m], neighbours[m]
+
+def match_value(match):
+    """Same value re.findall would give for this match"""
+    groups = match.groups('')
+    if not groups:
+        return match.group(0)
+    return groups[0] if len(groups) == 1 else groups
+
+def find_expiry_match(line, pattern, keywords):
+    """Match on a line, preferring the one right after an expiry keyword (not the production date)"""
+    matches = list(pattern.finditer(line['text']))
+    if len(matches) <= 1:
+        return matches[0] if matches else None
+    
+    keyword = keywords.search(line['text'])
+    if not keyword:
+        return matches[0]
+    
+    after = [m for m in matches if m.start() >= keyword.start()]
+    return after[0] if after else matches[-1]
+
+def line_containing(lines, value):
+    for line in lines:
+        if value and value in line['text']:
+            return line
+    return None
+
+def apply_patterns_with_geometry(lines, rules, text=None):
+    """Evidence-ranked extraction from OCR lines, see apply_json_regex_patterns"""
+    patterns = rules['patterns']
+    weights = rules['weights']
+    result = {
+        'product_name': None,
+        'expiry_date': None,
+        'quantity': None,
+        'barcode': None,
+        'confidence': 0,
+        'extraction_details': {},
+        'evidence': {}
+    }
+    evidence = result['evidence']
+    if text is None:
+        text = lines_to_text(lines)
+    
+    # Expiry date: keyword regions only, closest first
+    keywords = rules['expiry_keywords']
+    for line, proximity in rank_expiry_lines(lines, keywords, rules['expiry_region_min_score']):
+        for pattern in patterns['expiry_date']:
+            match = find_expiry_match(line, pattern, keywords)
+            if match:
+                result['expiry_date'] = clean_date(match_value(match))
+                evidence['expiry_date'] = round(line['confidence'] / 100 * proximity, 3)
+                result['extraction_details']['expiry_date'] = {
+                    'pattern': pattern.pattern,
+                    'matches': [match.group(0)],
+                    'line': line['text']
+                }
+                break
+        if result['expiry_date']:
+            break
+    
+    # No keyword near any date: one pass over the whole text, weaker evidence
+    if not result['expiry_date']:
+        for pattern in patterns['expiry_date']:
+            matches = pattern.findall(text)
+            if matches:
+                result['expiry_date'] = clean_date(matches[0])
+                line = line_containing(lines, result['expiry_date'])
+                evidence['expiry_date'] = round((line['confidence'] if line else 50) / 100 * 0.5, 3)
+                result['extraction_details']['expiry_date'] = {
+                    'pattern': pattern.pattern,
+                    'matches': matches[:3]
+                }
+                break
+    
+    # Product name: largest print first
+    name_lines = sorted(lines, key=lambda line: -line['bbox']['height'])[:rules['product_name_region_lines']]
+    for line in name_lines:
+        for pattern in patterns['product_name']:
+            match = pattern.search(line['text'])
+            if match:
+                result['product_name'] = clean_product_name(match_value(match))
+                evidence['product_name'] = round(line['confidence'] / 100, 3)
+                result['extraction_details']['product_name'] = {
+                    'pattern': pattern.pattern,
+                    'matches': [match.group(0)],
+                    'line': line['text']
+                }
+                break
+        if result['product_name']:
+            break
+    
+    # Quantity and barcode: one pass over the whole text, evidence from the matching line
+    for category in ('quantity', 'barcode'):
+        for pattern in patterns[category]:
+            matches = pattern.findall(text)
+            if matches:
+                result['extraction_details'][category] = {
+                    'pattern': pattern.pattern,
+                    'matches': matches[:3]
+                }
+                if category == 'quantity':
+                    result['quantity'] = clean_quantity(matches[0])
+                else:
+                    result['barcode'] = matches[0] if isinstance(matches[0], str) else matches[0][0]
+                
+                line = line_containing(lines, result[category])
+                if result[category] and line:
+                    evidence[category] = round(line['confidence'] / 100, 3)
+                break
+    
+    # Fallback for product name: first readable line, weaker evidence
+    if not result['product_name']:
+        for line in lines[:5]:
+            if len(line['text'].strip()) > 5:
+                result['product_name'] = line['text'].strip()[:40]
+                evidence['product_name'] = round(line['confidence'] / 100 * 0.5, 3)
+                break
+    
+    if not result['product_name']:
+        result['product_name'] = "Unknown Product"
+    
+    # Confidence: weight x OCR/proximity evidence instead of a fixed sum
+    result['confidence'] = round(sum(
+        weight * evidence.get(category, 0.0)
+        for category, weight in weights.items()
+        if result[category]
+    ))
+    
+    return result
+
 def clean_date(date_match):
     if isinstance(date_match, tuple):
         date_str = date_match[1] if len(date_match) > 1 else date_match[0]
@@ -0,0 +1,139 @@
+"""Re-run extraction on stored products with a given extraction rules version.
+
+Use it to roll back a bad rule set (or roll out a new one) over products
+that were already scanned. The OCR lines (text, confidence, bounding box)
+are read back from text/{file_id}.lines.json in S3 and go through the same
+geometry extraction as a live photo, so nothing is sent to Textract again.
+Products stored before the lines were kept are skipped: the plain-text path
+scores confidence on a different scale, so its results can't be stamped
+with the same rules version.
+
+Usage:
+    # Preview what the current rules would change for products extracted with a bad version
+    python backend/tools/backfill_extraction.py --only-version <bad VersionId> --dry-run
+
+    # Re-run them with a specific (good) rules version
+    python backend/tools/backfill_extraction.py --only-version <bad VersionId> --rules-version <good VersionId>
+
+Products the user already validated are skipped unless --include-validated.
+"""
+import os
+import sys
+import json
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'lambda_functions'))
+
+import lambda_function  # noqa: E402
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+EXTRACTED_FIELDS = ('product_name', 'expiry_date', 'quantity', 'barcode', 'confidence')
+
+
+def scan_products(only_version=None, user_id=None):
+    """Yield every product item matching the filters, following scan pagination"""
+    filters = []
+    if only_version:
+        filters.append(Attr('rules_version').eq(only_version))
+    if user_id:
+        filters.append(Attr('user_id').eq(str(user_id)))
+
+    params = {}
+    if filters:
+        expression = filters[0]
+        for condition in filters[1:]:
+            expression = expression & condition
+        params['FilterExpression'] = expression
+
+    while True:
+        response = lambda_function.products_store.scan(consistent=True, **params)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            break
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def read_ocr_lines(product):
+    """OCR lines stored at ingest, None for products scanned before they were kept"""
+    try:
+        response = lambda_function.s3.get_object(
+            Bucket=lambda_function.BUCKET_NAME,
+            Key=f"text/{product['file_id']}.lines.json"
+        )
+        return json.loads(response['Body'].read())
+    except Exception as e:
+        print(f"⚠️ No stored OCR lines for {product['product_id']} ({e}), skipping")
+        return None
+
+
+def backfill(rules, only_version=None, user_id=None, include_validated=False, dry_run=False):
+    counts = {'seen': 0, 'changed': 0, 'skipped': 0, 'no_lines': 0, 'failed': 0}
+
+    for product in scan_products(only_version, user_id):
+        counts['seen'] += 1
+        if product.get('status') == 'validated' and not include_validated:
+            counts['skipped'] += 1
+            continue
+
+        lines = read_ocr_lines(product)
+        if not lines:
+            counts['no_lines'] += 1
+            continue
+
+        text = lambda_function.lines_to_text(lines)
+        result = lambda_function.apply_json_regex_patterns(text, lines, rules=rules)
+        # Same values save_to_database writes: confidence stays a number, missing fields stay null
+        updates = {field: result[field] for field in EXTRACTED_FIELDS}
+        changes = {field: value for field, value in updates.items() if product.get(field) != value}
+        if not changes and product.get('rules_version') == rules['version']:
+            continue
+
+        counts['changed'] += 1
+        print(f"{'🔎' if dry_run else '✏️'} {product['product_id']}: {changes}")
+        if dry_run:
+            continue
+
+        updates['rules_version'] = rules['version']
+        try:
+            lambda_function.products_store.update(
+                Key={'product_id': product['product_id']},
+                UpdateExpression='SET ' + ', '.join(f"#{field} = :{field}" for field in updates),
+                ExpressionAttributeNames={f"#{field}": field for field in updates},
+                ExpressionAttributeValues={f":{field}": value for field, value in updates.items()}
+            )
+        except Exception as e:
+            # One bad item shouldn't stop the backfill, re-running it picks failures up again
+            counts['failed'] += 1
+            print(f"💥 Could not update {product['product_id']}: {e}")
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-run extraction with a given rules version')
+    parser.add_argument('--rules-version', help='S3 VersionId of the rules object (default: latest, "builtin" for the built-in rules)')
+    parser.add_argument('--only-version', help='only products extracted with this rules version')
+    parser.add_argument('--user-id', help='only products of this chat')
+    parser.add_argument('--include-validated', action='store_true', help='also overwrite products the user validated')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.rules_version == 'builtin':
+        rules = lambda_function.BUILTIN_RULES
+    else:
+        rules = lambda_function.load_rules_from_s3(version_id=args.rules_version)
+    print(f"📐 Using extraction rules version {rules['version']}")
+
+    counts = backfill(rules, args.only_version, args.user_id, args.include_validated, args.dry_run)
+    print(f"✅ {counts['seen']} products seen, {counts['changed']} {'would change' if args.dry_run else 'updated'}, {counts['skipped']} skipped")
+    if counts['no_lines']:
+        print(f"⚠️ {counts['no_lines']} product(s) scanned before OCR lines were stored were left as they are")
+    if counts['failed']:
+        print(f"💥 {counts['failed']} update(s) failed - re-run the backfill")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
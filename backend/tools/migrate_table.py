@@ -0,0 +1,111 @@
+"""Copy the products table to another region/table with a parallel segmented scan.
+
+Typical use: move shelf-saver-products from Stockholm next to the Lambda in Paris,
+then point the function at it with PRODUCTS_HOME_REGION=eu-west-3.
+
+Usage:
+    python backend/tools/migrate_table.py --source-region eu-north-1 --target-region eu-west-3 --create-table
+    python backend/tools/migrate_table.py --source-region eu-north-1 --target-region eu-west-3 --segments 16 --dry-run
+
+Items are written with put_item semantics, so the copy can be re-run safely
+(e.g. once more right before switching PRODUCTS_HOME_REGION to catch late writes).
+"""
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+
+
+def create_table_if_missing(region, table_name):
+    client = boto3.client('dynamodb', region_name=region)
+    try:
+        client.describe_table(TableName=table_name)
+        print(f"🗃️ {table_name} already exists in {region}")
+        return
+    except client.exceptions.ResourceNotFoundException:
+        pass
+
+    print(f"🗃️ Creating {table_name} in {region}")
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'product_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'product_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    client.get_waiter('table_exists').wait(TableName=table_name)
+
+
+def copy_segment(args, segment, progress):
+    """Scan one segment of the source and batch-write it to the target"""
+    # boto3 resources aren't thread safe, each worker gets its own session
+    session = boto3.session.Session()
+    source = session.resource('dynamodb', region_name=args.source_region).Table(args.source_table)
+    target = session.resource('dynamodb', region_name=args.target_region).Table(args.target_table)
+
+    params = {'Segment': segment, 'TotalSegments': args.segments, 'ConsistentRead': True}
+    copied = 0
+
+    with target.batch_writer(overwrite_by_pkeys=['product_id']) as batch:
+        while True:
+            response = source.scan(**params)
+            for item in response['Items']:
+                if not args.dry_run:
+                    batch.put_item(Item=item)
+                copied += 1
+
+            with progress['lock']:
+                progress['items'] += len(response['Items'])
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return copied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Copy the products table across regions')
+    parser.add_argument('--source-region', default='eu-north-1')
+    parser.add_argument('--source-table', default='shelf-saver-products')
+    parser.add_argument('--target-region', default='eu-west-3')
+    parser.add_argument('--target-table', default='shelf-saver-products')
+    parser.add_argument('--segments', type=int, default=8, help='parallel scan segments (one worker each)')
+    parser.add_argument('--create-table', action='store_true', help='create the target table if it does not exist')
+    parser.add_argument('--dry-run', action='store_true', help='scan the source without writing')
+    args = parser.parse_args(argv)
+
+    if (args.source_region, args.source_table) == (args.target_region, args.target_table):
+        parser.error('source and target are the same table')
+
+    if args.create_table and not args.dry_run:
+        create_table_if_missing(args.target_region, args.target_table)
+
+    print(f"🚚 {args.source_table} ({args.source_region}) -> {args.target_table} ({args.target_region}), {args.segments} segments")
+    progress = {'items': 0, 'lock': threading.Lock()}
+    started = time.time()
+    failures = 0
+
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        futures = {pool.submit(copy_segment, args, segment, progress): segment for segment in range(args.segments)}
+        for future in as_completed(futures):
+            segment = futures[future]
+            try:
+                print(f"✅ Segment {segment}: {future.result()} items")
+            except Exception as e:
+                failures += 1
+                print(f"💥 Segment {segment} failed: {e}")
+
+    elapsed = time.time() - started
+    action = 'scanned' if args.dry_run else 'copied'
+    print(f"✅ {progress['items']} items {action} in {elapsed:.1f}s ({progress['items'] / max(elapsed, 0.001):.0f} items/s)")
+    if failures:
+        print(f"💥 {failures} segment(s) failed - re-run the copy, it is idempotent")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
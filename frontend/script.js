@@ -81,7 +81,7 @@ async function loadProducts() {
         const productList = document.getElementById('product-list');
         productList.innerHTML = '<div class="loading">📡 Loading products...</div>';
         
-        const response = await fetch(`${API_BASE_URL}/products?user_id=${currentUserId}`);
+        const response = await fetch(`${API_BASE_URL}/products?user_id=${currentUserId}&size=small`);
         
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
@@ -92,19 +92,7 @@ async function loadProducts() {
         
         console.log('Loaded products:', allProducts);
         
-        const transformedProducts = allProducts.map(product => ({
-            id: product.product_id,
-            name: product.product_name || 'Unknown Product',
-            quantity: product.quantity || 'N/A',
-            expiry: product.expiry_date || 'Unknown',
-            confidence: Math.round(product.confidence || 0),
-            barcode: product.barcode,
-            status: product.status || 'pending',
-            image: product.image_url || `data:image/svg+xml,%3Csvg width="80" height="80" xmlns="http://www.w3.org/2000/svg"%3E%3Crect width="80" height="80" fill="%233390ec" rx="12"/%3E%3Ctext x="40" y="45" text-anchor="middle" fill="white" font-size="24" font-family="Arial"%3E📦%3C/text%3E%3C/svg%3E`,
-            created_at: product.created_at
-        }));
-        
-        displayProducts(transformedProducts);
+        renderProducts();
         
     } catch (error) {
         console.error('Error loading products:', error);
@@ -128,6 +116,33 @@ async function loadProducts() {
     }
 }
 
+function renderProducts() {
+    const transformedProducts = allProducts.map(product => ({
+        id: product.product_id,
+        name: product.product_name || 'Unknown Product',
+        quantity: product.quantity || 'N/A',
+        expiry: product.expiry_date || 'Unknown',
+        confidence: Math.round(product.confidence || 0),
+        barcode: product.barcode,
+        status: product.status || 'pending',
+        image: product.image_url || `data:image/svg+xml,%3Csvg width="80" height="80" xmlns="http://www.w3.org/2000/svg"%3E%3Crect width="80" height="80" fill="%233390ec" rx="12"/%3E%3Ctext x="40" y="45" text-anchor="middle" fill="white" font-size="24" font-family="Arial"%3E📦%3C/text%3E%3C/svg%3E`,
+        created_at: product.created_at
+    }));
+    
+    displayProducts(transformedProducts);
+}
+
+// Use the item returned by PUT instead of reloading: the list is read from the
+// nearest replica and could still show the old values right after a write
+function applyProductUpdate(updated) {
+    if (!updated) return;
+    const index = allProducts.findIndex(p => p.product_id === updated.product_id);
+    if (index === -1) return;
+    // Keep the thumbnail URL the list was loaded with
+    allProducts[index] = { ...updated, image_url: allProducts[index].image_url };
+    renderProducts();
+}
+
 function generateWorkingPlaceholderImage(productName) {
     const name = productName || 'Product';
     const firstLetter = name[0].toUpperCase();
@@ -287,9 +302,10 @@ async function editProduct(productId) {
             });
             
             if (updateResponse.ok) {
+                const data = await updateResponse.json();
                 if (typeof alert !== 'undefined') alert('Product updated successfully! ✅');
                 // tg.showAlert('Product updated successfully! ✅');
-                loadProducts();
+                applyProductUpdate(data.product);
             } else {
                 throw new Error('Update failed');
             }
@@ -313,9 +329,10 @@ async function validateProduct(productId) {
         console.log('✅ Update response status:', updateResponse.status);
 
         if (updateResponse.ok) {
+            const data = await updateResponse.json();
             if (typeof alert !== 'undefined') alert('Product validated! ✅');
             // tg.showAlert('Product validated! ✅');
-            await loadProducts();
+            applyProductUpdate(data.product);
         } else {
             const errorText = await updateResponse.text();
             console.error('❌ Validation failed:', errorText);
@@ -362,8 +379,8 @@ function setupEventListeners() {
         
         if (typeof alert !== 'undefined') alert(`🎉 Successfully validated ${pendingProducts.length} products! ✅`);
         
-        // Refresh the list
-        await loadProducts();
+        // Each validation already patched the list, a reload could hit a stale replica
+        renderProducts();
 
     } catch (error) {
         console.error('❌ Bulk validation error:', error);